@@ -0,0 +1,102 @@
+# Évaluation incrémentale (delta) de la fitness : un enfant qui ne diffère de son parent
+# que par quelques gènes est évalué en ne recalculant que les trajets et les stations touchés.
+
+import numpy as np
+from AlgoGenetics import main_AlgoGenetics
+
+
+class EtatGenome:
+    """
+    Décomposition de la fitness d'un génome :
+      - nb_camions et stations (copie du génome),
+      - visites : nombre de passages par station (indice station - 1, comme calculate_flow),
+      - distance : somme des trajets stations[j] -> stations[j + nb_camions],
+      - flux : somme des |flux| des stations non visitées,
+      - profondeur : nombre de deltas enchaînés depuis le dernier calcul complet.
+    """
+    __slots__ = ('nb_camions', 'stations', 'visites', 'distance', 'flux', 'profondeur')
+
+    def __init__(self, nb_camions, stations, visites, distance, flux, profondeur=0):
+        self.nb_camions = nb_camions
+        self.stations = stations
+        self.visites = visites
+        self.distance = distance
+        self.flux = flux
+        self.profondeur = profondeur
+
+
+class IncrementalEvaluator:
+    def __init__(self, distance, flux, poids_camions=1, poids_flux=200, poid_distance=1,
+                 seuil_changements=0.25, profondeur_max=20):
+        self.distance = distance
+        self.flux = flux
+        self.abs_flux = np.abs(flux)
+        self.poids_camions = poids_camions
+        self.poids_flux = poids_flux
+        self.poid_distance = poid_distance
+        # Au-delà de cette proportion de gènes modifiés, le calcul complet est plus rentable
+        self.seuil_changements = seuil_changements
+        # Recalcul complet périodique pour ne pas accumuler les erreurs d'arrondi
+        self.profondeur_max = profondeur_max
+        self.deltas = 0
+        self.complets = 0
+
+    def indices_flux(self, stations):
+        # Station 0 -> dernier indice, comme all_stations[-1] dans calculate_flow
+        return np.where(stations > 0, stations - 1, stations - 1 + len(self.flux))
+
+    # Calcul complet de l'état d'un génome
+    def etat(self, genome):
+        genome = np.asarray(genome, dtype=np.int64)
+        nb_camions, distance, flux = main_AlgoGenetics.composantes_batch(genome[None, :], self.distance, self.flux)
+        nb = int(nb_camions[0])
+        stations = genome[1:].copy()
+        if nb > 0:
+            visites = np.bincount(self.indices_flux(stations), minlength=len(self.flux)).astype(np.int32)
+        else:
+            visites = np.zeros(len(self.flux), dtype=np.int32)
+        self.complets += 1
+        return EtatGenome(nb, stations, visites, float(distance[0]), float(flux[0]))
+
+    # État de l'enfant déduit de celui du parent, ou None si un calcul complet est préférable
+    def deriver(self, parent, enfant):
+        enfant = np.asarray(enfant, dtype=np.int64)
+        nb = int(enfant[0])
+        if nb != parent.nb_camions or nb <= 0 or parent.profondeur >= self.profondeur_max:
+            return None
+        nouvelles = enfant[1:]
+        anciennes = parent.stations
+        changements = np.flatnonzero(nouvelles != anciennes)
+        if len(changements) > self.seuil_changements * len(anciennes):
+            return None
+        if len(changements) == 0:
+            return parent
+
+        # Trajets touchés : ceux qui partent ou arrivent à une position modifiée
+        longueur = len(anciennes)
+        legs = np.unique(np.concatenate([changements, changements - nb]))
+        legs = legs[(legs >= 0) & (legs < longueur - nb)]
+        distance = (parent.distance
+                    + self.distance[nouvelles[legs], nouvelles[legs + nb]].sum(dtype=np.float64)
+                    - self.distance[anciennes[legs], anciennes[legs + nb]].sum(dtype=np.float64))
+
+        # Stations dont le nombre de visites change, et passage visité <-> non visité
+        retirees = self.indices_flux(anciennes[changements])
+        ajoutees = self.indices_flux(nouvelles[changements])
+        visites = parent.visites.copy()
+        np.subtract.at(visites, retirees, 1)
+        np.add.at(visites, ajoutees, 1)
+        touchees = np.unique(np.concatenate([retirees, ajoutees]))
+        avant = parent.visites[touchees] > 0
+        apres = visites[touchees] > 0
+        flux = (parent.flux
+                + self.abs_flux[touchees[avant & ~apres]].sum()
+                - self.abs_flux[touchees[~avant & apres]].sum())
+
+        self.deltas += 1
+        return EtatGenome(nb, nouvelles.copy(), visites, distance, flux, parent.profondeur + 1)
+
+    def score(self, etat):
+        return float(main_AlgoGenetics.combiner_penalites(
+            etat.nb_camions, etat.distance, etat.flux,
+            self.poids_camions, self.poids_flux, self.poid_distance))
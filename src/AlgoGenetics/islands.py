@@ -0,0 +1,138 @@
+# Modèle en îles : plusieurs populations GeneticAlgorithm évoluent dans des processus séparés
+# et échangent leurs meilleurs individus toutes les `migration_interval` générations.
+
+import queue
+import traceback
+import multiprocessing
+from AlgoGenetics.main_AlgoGenetics import GeneticAlgorithm
+
+
+class IslandModel:
+    def __init__(self,
+                 n_islands=4,
+                 migration_interval=10,
+                 n_migrants=2,
+                 topology='ring',
+                 seed=None,
+                 **ga_params):
+        if topology not in ('ring', 'full'):
+            raise ValueError(f"Topologie inconnue : {topology} (attendu : 'ring' ou 'full')")
+        self.n_islands = n_islands
+        self.migration_interval = migration_interval
+        self.n_migrants = n_migrants
+        self.topology = topology
+        self.seed = seed
+        # Paramètres passés à chaque GeneticAlgorithm (une île = un processus, pas de pool interne)
+        self.ga_params = dict(ga_params, workers=1)
+
+    # Îles vers lesquelles l'île i envoie ses migrants
+    def voisins(self, i):
+        if self.n_islands < 2:
+            return []
+        if self.topology == 'ring':
+            return [(i + 1) % self.n_islands]
+        return [j for j in range(self.n_islands) if j != i]
+
+    # Îles dont l'île i reçoit des migrants
+    def sources(self, i):
+        return [j for j in range(self.n_islands) if i in self.voisins(j)]
+
+    def island_seed(self, i):
+        return None if self.seed is None else self.seed + i
+
+    # Résultats des îles, en surveillant les processus : une île qui plante
+    # (exception ou arrêt brutal) interrompt le run au lieu de le bloquer indéfiniment
+    def collecter(self, results, processes, intervalle=1.0):
+        resultats = []
+        while len(resultats) < self.n_islands:
+            try:
+                island_id, genome, score = results.get(timeout=intervalle)
+            except queue.Empty:
+                mortes = [i for i, p in enumerate(processes) if p.exitcode not in (None, 0)]
+                if mortes:
+                    self.arreter(processes)
+                    raise RuntimeError(f"Île(s) {mortes} arrêtée(s) sans résultat "
+                                       f"(codes de sortie : {[processes[i].exitcode for i in mortes]})")
+                continue
+            if genome is None:
+                self.arreter(processes)
+                raise RuntimeError(f"Erreur dans l'île {island_id} :\n{score}")
+            resultats.append((island_id, genome, score))
+        return resultats
+
+    def arreter(self, processes):
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+
+    def run(self):
+        # Une file par arc (source -> destination) : les migrants d'une même
+        # source arrivent dans l'ordre des migrations
+        canaux = {(i, j): multiprocessing.Queue()
+                  for i in range(self.n_islands) for j in self.voisins(i)}
+        results = multiprocessing.Queue()
+        processes = []
+        for i in range(self.n_islands):
+            sorties = [canaux[(i, j)] for j in self.voisins(i)]
+            entrees = [canaux[(j, i)] for j in self.sources(i)]
+            p = multiprocessing.Process(
+                target=_island_worker,
+                args=(i, self.ga_params, self.island_seed(i), self.migration_interval,
+                      self.n_migrants, sorties, entrees, results)
+            )
+            p.start()
+            processes.append(p)
+
+        resultats = sorted(self.collecter(results, processes))
+        for p in processes:
+            p.join()
+
+        for island_id, genome, score in resultats:
+            print(f"Île {island_id}: Meilleur score: {score}")
+        _, best_genome, best_score = max(resultats, key=lambda r: r[2])
+        print(f"Meilleure solution (toutes îles) : {best_genome}")
+        print(f"Fitness finale : {best_score}")
+        return best_genome, best_score
+
+
+def _island_worker(island_id, ga_params, seed, migration_interval, n_migrants,
+                   sorties, entrees, results):
+    try:
+        best, best_score = _evoluer_ile(ga_params, seed, migration_interval, n_migrants, sorties, entrees)
+    except Exception:
+        # Le traceback remonte au processus principal, qui interrompt le run
+        results.put((island_id, None, traceback.format_exc()))
+        raise
+    results.put((island_id, best, float(best_score)))
+
+
+# Évolution d'une île ; retourne le meilleur génome rencontré sur toutes les générations
+# (comme GeneticAlgorithm.evolve), pas seulement le meilleur de la dernière
+def _evoluer_ile(ga_params, seed, migration_interval, n_migrants, sorties, entrees):
+    ga = GeneticAlgorithm(seed=seed, **ga_params)
+    ga.population = ga.generer_population()
+    best_genome, best_score = None, -float('inf')
+
+    def retenir(best, score):
+        nonlocal best_genome, best_score
+        if score > best_score:
+            best_genome, best_score = best.copy(), score
+
+    for generation in range(ga.generations):
+        retenir(*ga.classer_population())
+        migration = (generation + 1) % migration_interval == 0 and generation + 1 < ga.generations
+        if migration and (sorties or entrees):
+            migrants = ga.population[ga.ordre[:n_migrants]].copy()
+            for canal in sorties:
+                canal.put(migrants)
+            # Lecture dans l'ordre des îles sources pour que les runs avec graine restent déterministes
+            arrivants = [genome for canal in entrees for genome in canal.get()][:ga.population_size]
+            if arrivants:
+                # Les arrivants remplacent les pires individus de l'île
+                ga.population[ga.ordre[len(ga.ordre) - len(arrivants):]] = arrivants
+                retenir(*ga.classer_population())
+        ga.nouvelle_generation()
+
+    retenir(*ga.classer_population())
+    return best_genome, best_score
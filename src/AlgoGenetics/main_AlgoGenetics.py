@@ -1,7 +1,11 @@
 # Créé par cerma, le 19/03/2025 en Python 3.7
 
-import random
-import pandas as pd
+import time
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+import numpy as np
+from Instrumentation import metrics
 
 class GeneticAlgorithm:
     def __init__(self,
@@ -13,7 +17,13 @@ class GeneticAlgorithm:
                  poids_flux = 200,
                  poid_distance = 1,
                  distance_matrix=None,
-                 stations=None):
+                 stations=None,
+                 cache_size=100000,
+                 workers=1,
+                 seed=None,
+                 incremental=False,
+                 neighbors=None,
+                 neighbour_bias=0.5):
         self.genome_length = genome_length
         self.population_size = population_size
         self.mutation_rate = mutation_rate
@@ -23,18 +33,68 @@ class GeneticAlgorithm:
         self.poid_distance = poid_distance
         self.distance_matrix = distance_matrix
         self.stations = stations
-        self.population = []
+        self.population = np.empty((0, genome_length + 1), dtype=np.int64)
+        # Versions ndarray pour l'évaluation vectorisée de la population
+        # (une matrice flottante, ex. .npy mappé en float32, est utilisée telle quelle, sans copie)
+        self.distance_array = None if distance_matrix is None else np.asarray(distance_matrix)
+        if self.distance_array is not None and not np.issubdtype(self.distance_array.dtype, np.floating):
+            self.distance_array = self.distance_array.astype(float)
+        self.flux_array = None if stations is None else np.asarray(stations, dtype=float)
+        # Cache LRU des fitness (clé : génome normalisé en tuple d'entiers)
+        self.cache_size = cache_size
+        self.fitness_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Doublons d'une même génération évalués une seule fois (hors cache)
+        self.doublons = 0
+        self.scores = []
+        # Évaluation parallèle (workers > 1) et graine pour des exécutions reproductibles
+        self.workers = workers
+        self.pool = None
+        self.rng = np.random.default_rng(seed)
+        # Valeurs tirées par la mutation : 0..10, bornées par genome_length pour rester des stations valides
+        self.valeur_mutation_max = min(10, genome_length)
+        # Graphe k-NN des stations (indices de la matrice de distances) : une station mutée
+        # est remplacée par un voisin de la station actuelle avec la probabilité neighbour_bias
+        self.neighbors = None if neighbors is None else np.asarray(neighbors, dtype=np.int64)
+        self.neighbour_bias = neighbour_bias
+        # Évaluation incrémentale des enfants à partir de l'état de leurs parents
+        self.incremental = None
+        if incremental:
+            from AlgoGenetics.incremental import IncrementalEvaluator
+            self.incremental = IncrementalEvaluator(self.distance_array, self.flux_array,
+                                                    poids_camions, poids_flux, poid_distance)
+        self.etats = []
+        self.parents = []
+        self.parents_population = self.population
+        self.etats_parents = []
+        self.ordre = np.arange(0)
+        # Population en double tampon : les enfants sont écrits dans le tampon inactif,
+        # puis les rôles sont échangés (aucune allocation de population entre générations)
+        n_lignes = population_size + population_size % 2
+        self.tampons = [np.zeros((n_lignes, genome_length + 1), dtype=np.int64) for _ in range(2)]
+        self.tampon_courant = 0
+        self.colonnes = np.arange(genome_length + 1)
+        self.masque_croisement = np.empty((n_lignes // 2, genome_length + 1), dtype=bool)
+        self.tirages_mutation = np.empty((n_lignes, genome_length + 1))
+        self.masque_mutation = np.empty((n_lignes, genome_length + 1), dtype=bool)
 
     def initialize_population(self):
         self.population = self.generator.generer_population()
 
     # Générer un individu aléatoire en fonction du nombre de station
     def generer_individu(self):
-        return [random.randint(1,100)]+[random.randint(0, self.genome_length) for i in range (self.genome_length)]
+        individu = np.empty(self.genome_length + 1, dtype=np.int64)
+        individu[0] = self.rng.integers(1, 101)
+        individu[1:] = self.rng.integers(0, self.genome_length + 1, self.genome_length)
+        return individu
 
-    # Générer une population
+    # Générer une population (écrite dans le tampon courant)
     def generer_population(self):
-        return [self.generer_individu() for _ in range(self.population_size)]
+        tampon = self.tampons[self.tampon_courant]
+        tampon[:, 0] = self.rng.integers(1, 101, tampon.shape[0])
+        tampon[:, 1:] = self.rng.integers(0, self.genome_length + 1, (tampon.shape[0], self.genome_length))
+        return tampon[:self.population_size]
 
     # Fonction d'évaluation (Fitness function) : Limiter les trajets trop long, l'utilisation de camion et surtout doit rééquilibrer les stations
 
@@ -57,6 +117,123 @@ class GeneticAlgorithm:
         # Moins la valeur est grande, mieux c’est → On inverse pour que la fitness soit à maximiser
         return 1 / (penalite_distance + penalite_camions + penalite_flux + 1e-6)  # éviter division par 0
 
+    # Fitness de toute la population d'un coup (matrice entière : une ligne par génome)
+    # Donne exactement les mêmes valeurs que fitness() appliquée génome par génome :
+    # les deux chemins cumulent les distances en float64, même si la matrice est en float32
+    @metrics.timed("ga.fitness_population")
+    def fitness_population(self, population):
+        population = self.population_to_array(population)
+        metrics.items("ga.fitness_population", len(population))
+        if self.pool is not None and len(population) >= 2 * self.workers:
+            morceaux = np.array_split(population, self.workers)
+            return np.concatenate(self.pool.map(_score_chunk, morceaux))
+        return fitness_batch(population, self.distance_array, self.flux_array,
+                             self.poids_camions, self.poids_flux, self.poid_distance)
+
+    # Convertit une liste de génomes en matrice d'entiers
+    def population_to_array(self, population):
+        if isinstance(population, np.ndarray):
+            return population.astype(np.int64, copy=False)
+        return np.array([[int(bit) for bit in genome] for genome in population], dtype=np.int64)
+
+    # Démarre le pool de processus : la matrice de distances et les flux prévus
+    # sont transmis une seule fois à chaque processus via l'initializer
+    def open_pool(self):
+        if self.workers > 1 and self.pool is None:
+            self.pool = multiprocessing.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.distance_array, self.flux_array,
+                          self.poids_camions, self.poids_flux, self.poid_distance)
+            )
+        return self.pool
+
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    # Empreinte de 16 octets du génome : la clé ne grossit pas avec genome_length
+    def genome_key(self, genome):
+        return hashlib.blake2b(np.asarray(genome, dtype=np.int64).tobytes(), digest_size=16).digest()
+
+    def cache_store(self, key, score):
+        self.fitness_cache[key] = score
+        if len(self.fitness_cache) > self.cache_size:
+            self.fitness_cache.popitem(last=False)
+
+    # Fitness d'un génome via le cache : chaque génome n'est calculé qu'une fois
+    def fitness_cached(self, genome):
+        key = self.genome_key(genome)
+        if key in self.fitness_cache:
+            self.cache_hits += 1
+            self.fitness_cache.move_to_end(key)
+            return self.fitness_cache[key]
+        self.cache_misses += 1
+        score = self.fitness(genome)
+        self.cache_store(key, score)
+        return score
+
+    # Scores de toute la population : les génomes absents du cache sont évalués en un seul lot
+    @metrics.timed("ga.scores_population")
+    def scores_population(self, population):
+        population = self.population_to_array(population)
+        keys = [self.genome_key(genome) for genome in population]
+        scores = np.empty(len(keys))
+        manquants = {}
+        for i, key in enumerate(keys):
+            if key in self.fitness_cache:
+                self.cache_hits += 1
+                self.fitness_cache.move_to_end(key)
+                scores[i] = self.fitness_cache[key]
+            elif key in manquants:
+                # Doublon dans la même génération : calculé une seule fois
+                self.doublons += 1
+                manquants[key].append(i)
+            else:
+                self.cache_misses += 1
+                manquants[key] = [i]
+        etats = [None] * len(keys)
+        if manquants and self.incremental is not None and len(self.parents) == len(keys):
+            for key in list(manquants):
+                etat = self.deriver_enfant(population[manquants[key][0]], self.parents[manquants[key][0]])
+                if etat is None:
+                    continue
+                score = self.incremental.score(etat)
+                for i in manquants.pop(key):
+                    scores[i] = score
+                    etats[i] = etat
+                self.cache_store(key, score)
+        self.etats = etats
+        if manquants:
+            nouveaux = self.fitness_population(population[[indices[0] for indices in manquants.values()]])
+            for (key, indices), score in zip(manquants.items(), nouveaux):
+                score = float(score)
+                scores[indices] = score
+                self.cache_store(key, score)
+        return scores
+
+    # État incrémental de l'enfant déduit de l'un de ses parents (None si impossible)
+    def deriver_enfant(self, enfant, parents):
+        for i in parents:
+            etat = self.incremental.deriver(self.etat_parent(i), enfant)
+            if etat is not None:
+                return etat
+        return None
+
+    # État d'un parent de la génération précédente, calculé à la demande
+    def etat_parent(self, i):
+        if self.etats_parents[i] is None:
+            self.etats_parents[i] = self.incremental.etat(self.parents_population[i])
+        return self.etats_parents[i]
+
+    def cache_stats(self):
+        total = self.cache_hits + self.cache_misses
+        taux = self.cache_hits / total if total else 0.0
+        return {'hits': self.cache_hits, 'misses': self.cache_misses, 'hit_rate': taux,
+                'doublons': self.doublons}
+
     def decoder_genome(self, genome):
         nb_camions = int(genome[0])
         stations = genome[1:]
@@ -77,7 +254,7 @@ class GeneticAlgorithm:
             if len(trajet) < 2:
                 continue
             for i in range(len(trajet) - 1):
-                total += self.distance_matrix[trajet[i]][trajet[i + 1]]
+                total += float(self.distance_matrix[trajet[i]][trajet[i + 1]])
         return total
 
     # Compte la différence total des fluxs de vélo dans toute les stations
@@ -98,50 +275,217 @@ class GeneticAlgorithm:
 
     # Croisement (Crossover) à un point
     def crossover(self, parent1, parent2):
-        point = random.randint(1, self.genome_length - 1)
-        return parent1[:point] + parent2[point:], parent2[:point] + parent1[point:]
+        point = self.rng.integers(1, self.genome_length)
+        return (np.concatenate([parent1[:point], parent2[point:]]),
+                np.concatenate([parent2[:point], parent1[point:]]))
+
+    # Croisement à un point de toutes les paires, écrit directement dans le tampon `enfants`
+    # (enfants[2k] et enfants[2k + 1] sont issus de la paire (parents1[k], parents2[k]))
+    def crossover_population(self, population, parents1, parents2, enfants):
+        points = self.rng.integers(1, self.genome_length, len(parents1))
+        apres = np.greater_equal(self.colonnes, points[:, None], out=self.masque_croisement)
+        np.take(population, parents1, axis=0, out=enfants[0::2])
+        np.copyto(enfants[0::2], population[parents2], where=apres)
+        np.take(population, parents2, axis=0, out=enfants[1::2])
+        np.copyto(enfants[1::2], population[parents1], where=apres)
 
     # Mutation (inversion aléatoire de bits)
     def mutation(self, individu):
-        return [bit if random.random() > self.mutation_rate else str(random.randint(0,10)) for bit in individu]
+        individu = np.array(individu, dtype=np.int64)
+        masque = self.rng.random(len(individu)) <= self.mutation_rate
+        individu[masque] = self.valeurs_mutees(individu[masque], np.flatnonzero(masque))
+        return individu
+
+    # Nouvelles valeurs des gènes mutés : tirage uniforme, ou voisin de la station actuelle
+    # (gènes de station uniquement, si le graphe k-NN est fourni et que le voisin est une station valide)
+    def valeurs_mutees(self, actuelles, colonnes):
+        valeurs = self.rng.integers(0, self.valeur_mutation_max + 1, len(actuelles))
+        if self.neighbors is None or len(actuelles) == 0:
+            return valeurs
+        voisin = ((colonnes > 0) & (actuelles < len(self.neighbors))
+                  & (self.rng.random(len(actuelles)) < self.neighbour_bias))
+        choix = self.rng.integers(0, self.neighbors.shape[1], np.count_nonzero(voisin))
+        candidats = self.neighbors[actuelles[voisin], choix]
+        valides = candidats <= self.genome_length
+        valeurs[np.flatnonzero(voisin)[valides]] = candidats[valides]
+        return valeurs
 
-    # Sélection par tournoi
+    # Mutation en place de tout le tampon : chaque gène est remplacé avec la probabilité mutation_rate
+    def mutation_population(self, enfants):
+        self.rng.random(out=self.tirages_mutation)
+        masque = np.less_equal(self.tirages_mutation, self.mutation_rate, out=self.masque_mutation)
+        if self.neighbors is None:
+            enfants[masque] = self.rng.integers(0, self.valeur_mutation_max + 1, np.count_nonzero(masque))
+        else:
+            enfants[masque] = self.valeurs_mutees(enfants[masque], np.nonzero(masque)[1])
+
+    # Sélection par tournoi (utilise les scores déjà calculés de la génération)
     def selection(self):
-        return max(random.sample(self.population, 3), key=self.fitness)
+        if len(self.scores) != len(self.population):
+            candidats = self.rng.choice(len(self.population), 3, replace=False)
+            return self.population[max(candidats, key=lambda i: self.fitness_cached(self.population[i]))]
+        return self.population[self.selection_index(1)[0]]
+
+    # Indices des vainqueurs de n tournois à 3 candidats distincts, en O(n) :
+    # b est tiré parmi p - 1 valeurs et décalé au-delà de a, c parmi p - 2 valeurs et
+    # décalé au-delà de min(a, b) puis de max(a, b)
+    def selection_index(self, n):
+        p = len(self.population)
+        a = self.rng.integers(0, p, n)
+        b = self.rng.integers(0, p - 1, n)
+        b += b >= a
+        c = self.rng.integers(0, p - 2, n)
+        bas, haut = np.minimum(a, b), np.maximum(a, b)
+        c += c >= bas
+        c += c >= haut
+        candidats = np.stack([a, b, c], axis=1)
+        gagnants = np.argmax(self.scores[candidats], axis=1)
+        return candidats[np.arange(n), gagnants]
 
-    def evolve(self):
+    # Évalue la population et calcule son classement (meilleur en premier) sans déplacer les génomes
+    def classer_population(self):
+        self.scores = self.scores_population(self.population)
+        self.ordre = np.argsort(-self.scores, kind='stable')
+        meilleur = self.ordre[0]
+        return self.population[meilleur], self.scores[meilleur]
+
+    # Remplace la population par les enfants issus de sélection, croisement et mutation
+    @metrics.timed("ga.nouvelle_generation")
+    def nouvelle_generation(self):
+        enfants = self.tampons[1 - self.tampon_courant]
+        gagnants = self.selection_index(len(enfants))
+        parents1, parents2 = gagnants[0::2], gagnants[1::2]
+        self.crossover_population(self.population, parents1, parents2, enfants)
+        self.mutation_population(enfants)
+
+        # Parents conservés pour l'évaluation incrémentale des enfants
+        self.parents_population = self.population
+        self.etats_parents = list(self.etats)
+        self.parents = np.stack([gagnants, np.stack([parents2, parents1], axis=1).ravel()],
+                                axis=1)[:self.population_size]
+        self.tampon_courant = 1 - self.tampon_courant
+        self.population = enfants[:self.population_size]
+        self.scores = []
+
+    # Affichage par défaut de la progression
+    def afficher_progression(self, generation, best_score):
+        print(f"Génération {generation}: Meilleur score: {best_score}")
+
+    # Évolution jusqu'à `generations`, ou avant si le budget de temps (secondes) est écoulé
+    # ou si le meilleur score ne progresse plus de plus de `epsilon` pendant `patience` générations.
+    # `progress(generation, best_score)` est appelée toutes les `progress_every` générations.
+    # Retourne le meilleur génome rencontré, son score et la raison de l'arrêt.
+    def evolve(self, time_budget=None, patience=None, epsilon=0.0, progress=None, progress_every=10):
+        progress = progress or self.afficher_progression
+        debut = time.monotonic()
         self.population = self.generer_population()
+        self.best_genome, self.best_score = None, -np.inf
+        reference = -np.inf  # score de la dernière amélioration significative
+        stagnation = 0
+        generation = 0
 
-        for generation in range(self.generations):
-            self.population = sorted(
-                self.population,
-                key=self.fitness,
-                reverse=True
-            )
-            best = self.population[0]
-            best_score = self.fitness(best)
-            print(f"Génération {generation}: Meilleur score: {best_score}")
-
-            new_population = []
-            while len(new_population) < self.population_size:
-                parent1 = self.selection()
-                parent2 = self.selection()
-                enfant1, enfant2 = self.crossover(parent1, parent2)
-                enfant1 = self.mutation(enfant1)
-                enfant2 = self.mutation(enfant2)
-                new_population.extend([enfant1, enfant2])
-
-            self.population = new_population[:self.population_size]
-
-        return sorted(
-            self.population,
-            key=self.fitness,
-            reverse=True
-        )[0]
-
-    def run(self):
-        best_genome = self.evolve()
+        while True:
+            best, best_score = self.classer_population()
+            if best_score > reference + epsilon:
+                reference = best_score
+                stagnation = 0
+            else:
+                stagnation += 1
+            if best_score > self.best_score:
+                self.best_genome, self.best_score = best.copy(), best_score
+            if generation % progress_every == 0:
+                progress(generation, self.best_score)
+
+            if generation >= self.generations:
+                raison = 'generations'
+                break
+            if patience is not None and stagnation >= patience:
+                raison = 'stagnation'
+                break
+            if time_budget is not None and time.monotonic() - debut >= time_budget:
+                raison = 'time_budget'
+                break
+            self.nouvelle_generation()
+            generation += 1
+
+        if generation % progress_every != 0:
+            progress(generation, self.best_score)
+        metrics.count("ga.generations", generation)
+        return self.best_genome, self.best_score, raison
+
+    @metrics.timed("ga.run")
+    def run(self, time_budget=None, patience=None, epsilon=0.0, progress=None, progress_every=10):
+        self.open_pool()
+        try:
+            best_genome, _, raison = self.evolve(time_budget, patience, epsilon, progress, progress_every)
+        finally:
+            self.close_pool()
         print(f"Meilleure solution trouvée : {best_genome}")
-        score = self.fitness(best_genome)
+        score = self.fitness_cached(best_genome)
         print(f"Fitness finale : {score}")
-        return best_genome, score
\ No newline at end of file
+        print(f"Arrêt : {raison}")
+        stats = self.cache_stats()
+        print(f"Cache fitness : {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.1%})")
+        metrics.count("ga.cache_hits", stats['hits'])
+        metrics.count("ga.cache_misses", stats['misses'])
+        metrics.count("ga.doublons", stats['doublons'])
+        return best_genome, score, raison
+
+# Données des processus du pool, initialisées une seule fois par processus
+_worker_data = {}
+
+def _init_worker(distance, flux, poids_camions, poids_flux, poid_distance):
+    _worker_data.update(distance=distance, flux=flux, poids_camions=poids_camions,
+                        poids_flux=poids_flux, poid_distance=poid_distance)
+
+def _score_chunk(chunk):
+    return fitness_batch(chunk, **_worker_data)
+
+# Fitness vectorisée d'une matrice de génomes (n_genomes, 1 + genome_length)
+# Reproduit repartir_stations / distance_totale / calculate_flow / flux_stations :
+# le camion k visite les stations k, k + nb, k + 2 nb, ... donc chaque trajet relie
+# stations[j] à stations[j + nb]. Les sommes sont faites dans le même ordre que la
+# version scalaire (camion par camion, puis station par station) pour un résultat identique.
+def fitness_batch(population, distance, flux, poids_camions=1, poids_flux=200, poid_distance=1):
+    nb_camions, total_distance, total_flux = composantes_batch(population, distance, flux)
+    return combiner_penalites(nb_camions, total_distance, total_flux,
+                              poids_camions, poids_flux, poid_distance)
+
+# Nombre de camions, distance totale et flux restant de chaque génome de la population
+def composantes_batch(population, distance, flux):
+    population = np.asarray(population, dtype=np.int64)
+    if population.ndim == 1:
+        population = population[None, :]
+    n, longueur = population.shape[0], population.shape[1] - 1
+    nb_camions = population[:, 0]
+    stations = population[:, 1:]
+    nb = nb_camions[:, None]
+    positions = np.arange(longueur)[None, :]
+
+    # Distances des trajets : stations[j] -> stations[j + nb] pour j < longueur - nb
+    valide = (nb > 0) & (positions < longueur - nb)
+    suivant = np.where(valide, positions + np.maximum(nb, 1), 0)
+    destinations = np.take_along_axis(stations, suivant, axis=1)
+    # Distances lues dans la matrice (float32 possible) puis cumulées en float64 comme distance_totale
+    trajets = np.where(valide, distance[stations, destinations].astype(np.float64), 0.0)
+    # Ordre de sommation camion par camion (j % nb, puis j), trajets invalides à la fin
+    cle = np.where(valide, (positions % np.maximum(nb, 1)) * longueur + positions, longueur * longueur)
+    ordre = np.argsort(cle, axis=1, kind='stable')
+    trajets = np.take_along_axis(trajets, ordre, axis=1)
+    total_distance = np.cumsum(trajets, axis=1)[:, -1] if longueur else np.zeros(n)
+
+    # Flux restants : les stations visitées sont remises à 0 (indice station - 1, comme calculate_flow)
+    visitees = np.zeros((n, flux.shape[0]), dtype=bool)
+    lignes = np.broadcast_to(np.arange(n)[:, None], stations.shape)
+    masque = np.broadcast_to(nb > 0, stations.shape)
+    visitees[lignes[masque], stations[masque] - 1] = True
+    flux_restants = np.where(visitees, 0.0, np.abs(flux)[None, :])
+    total_flux = np.cumsum(flux_restants, axis=1)[:, -1] if flux.shape[0] else np.zeros(n)
+    return nb_camions, total_distance, total_flux
+
+# Même combinaison des pénalités que fitness()
+def combiner_penalites(nb_camions, total_distance, total_flux, poids_camions, poids_flux, poid_distance):
+    penalite_camions = nb_camions * poids_camions
+    penalite_flux = total_flux * poids_flux
+    penalite_distance = total_distance * poid_distance
+    return 1 / (penalite_distance + penalite_camions + penalite_flux + 1e-6)
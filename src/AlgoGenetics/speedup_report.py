@@ -0,0 +1,70 @@
+# Rapport d'accélération de l'évaluation parallèle de la population (workers = 1, 2, 4, ...)
+# À lancer depuis src/ : python -m AlgoGenetics.speedup_report [chemin_matrice.csv]
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from AlgoGenetics.main_AlgoGenetics import GeneticAlgorithm
+
+
+def charger_matrice(csv_path, n_stations=600, seed=0):
+    """
+    Charge la matrice de distances réelle si elle existe, sinon génère une matrice
+    synthétique de même taille (n_stations x n_stations).
+    """
+    if os.path.exists(csv_path):
+        return pd.read_csv(csv_path, index_col=0).values
+    rng = np.random.default_rng(seed)
+    coords = rng.random((n_stations, 2)) * 20
+    return np.sqrt(((coords[:, None, :] - coords[None, :, :]) ** 2).sum(axis=2))
+
+
+def rapport_acceleration(distance_matrix, workers_list=(1, 2, 4, 8), population_size=100,
+                         repetitions=20, seed=0):
+    """
+    Mesure le temps d'évaluation d'une population pour chaque nombre de workers.
+    Retourne une liste de dictionnaires {workers, temps, acceleration}.
+    """
+    distance_matrix = np.asarray(distance_matrix, dtype=float)
+    genome_length = distance_matrix.shape[0] - 1
+    flux = np.random.default_rng(seed).normal(size=genome_length)
+    resultats = []
+    reference = None
+    temps_1 = None
+    for workers in workers_list:
+        ga = GeneticAlgorithm(genome_length=genome_length, population_size=population_size,
+                              distance_matrix=distance_matrix, stations=flux,
+                              workers=workers, seed=seed)
+        populations = [ga.generer_population().copy() for _ in range(repetitions)]
+        ga.open_pool()
+        try:
+            debut = time.perf_counter()
+            scores = [ga.fitness_population(population) for population in populations]
+            temps = time.perf_counter() - debut
+        finally:
+            ga.close_pool()
+        # Les scores doivent être identiques quel que soit le nombre de workers
+        if reference is None:
+            reference = scores
+        elif not all(np.array_equal(a, b) for a, b in zip(reference, scores)):
+            raise RuntimeError(f"Scores différents avec {workers} workers")
+        temps_1 = temps_1 or temps
+        resultats.append({'workers': workers, 'temps': temps, 'acceleration': temps_1 / temps})
+    return resultats
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "../data/GLOBAL_distance_all.csv"
+    distance_matrix = charger_matrice(csv_path)
+    n_cpu = os.cpu_count() or 1
+    workers_list = [w for w in (1, 2, 4, 8, 16) if w <= n_cpu] or [1]
+    print(f"Matrice : {distance_matrix.shape[0]} stations, {n_cpu} CPU")
+    print("workers | temps (s) | accélération")
+    for r in rapport_acceleration(distance_matrix, workers_list):
+        print(f"{r['workers']:>7} | {r['temps']:>9.3f} | x{r['acceleration']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
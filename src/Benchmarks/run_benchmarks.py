@@ -0,0 +1,237 @@
+# Benchmarks du pipeline sur des villes synthétiques (2k, 5k, 10k stations, ...).
+# À lancer depuis src/ : python -m Benchmarks.run_benchmarks --stations 2000 5000 --output resultats.json
+# Chaque étape est mesurée (temps, débit, pic mémoire, qualité) et les résultats sont écrits
+# en JSON avec la version du code, pour comparer deux versions sur les mêmes graines.
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import threading
+import contextlib
+import numpy as np
+import pandas as pd
+import sklearn
+from Benchmarks.synthetic_city import SyntheticCity
+from Data_cleanup import aggregate, flux, distance_store
+from RandomForest.mainRandomForest import BikeFluctuationPredictor
+from AlgoGenetics.main_AlgoGenetics import GeneticAlgorithm
+from OR_Strategies.OR_tool import TSPSolver
+
+STAGES = ['trips_csv', 'process_trip_files', 'compute_usage_counts', 'daily_net_flow',
+          'compute_distance_matrix', 'write_distance_matrix_npy', 'forecast', 'genetic_algorithm', 'tsp']
+
+
+def rss_mb():
+    """
+    Mémoire résidente actuelle du processus (Mo), lue dans /proc (Linux) ; None ailleurs.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return None
+
+
+class PicMemoire(threading.Thread):
+    """
+    Échantillonne la mémoire résidente toutes les intervalle secondes pendant une étape :
+    contrairement à tracemalloc, couvre la mémoire native (OR-Tools) sans ralentir l'étape.
+    Un pic plus court que l'intervalle peut échapper à la mesure.
+    """
+    def __init__(self, intervalle=0.01):
+        super().__init__(daemon=True)
+        self.intervalle = intervalle
+        self.arret = threading.Event()
+        self.depart = rss_mb()
+        self.pic = self.depart
+
+    def run(self):
+        while not self.arret.wait(self.intervalle):
+            self.pic = max(self.pic, rss_mb())
+
+    def stop(self):
+        self.arret.set()
+        self.join()
+        self.pic = max(self.pic, rss_mb())
+        return self.pic - self.depart
+
+
+def mesurer(fonction, memoire=True, verbose=False):
+    """
+    Exécute fonction() et retourne (résultat, temps en s, pic mémoire en Mo).
+    Le pic mémoire est la hausse maximale de la mémoire résidente pendant l'étape
+    (None si memoire est faux ou hors Linux).
+    Les affichages de l'étape sont masqués sauf si verbose.
+    """
+    sortie = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    sonde = PicMemoire() if memoire and rss_mb() is not None else None
+    if sonde is not None:
+        sonde.start()
+    try:
+        with sortie:
+            debut = time.perf_counter()
+            resultat = fonction()
+            temps = time.perf_counter() - debut
+    finally:
+        pic = sonde.stop() if sonde is not None else None
+    return resultat, temps, pic
+
+
+def benchmark_ville(n_stations, n_trips, days, seed, workdir, stages, memoire=True, verbose=False,
+                    ga_generations=50, ga_population=100, tsp_max_stations=1000, tsp_time_limit=10):
+    """
+    Génère une ville synthétique et mesure les étapes demandées (dans l'ordre de STAGES).
+    Retourne une liste de dictionnaires {stations, stage, seconds, items, throughput, unit, peak_mb, quality}.
+    """
+    city = SyntheticCity(n_stations, seed)
+    dossier = os.path.join(workdir, f"ville_{n_stations}_{seed}")
+    dossier_trajets = os.path.join(dossier, "trips")
+    os.makedirs(dossier_trajets, exist_ok=True)
+    resultats = []
+
+    def etape(nom, fonction, items, unit, qualite=None):
+        if nom not in stages:
+            return None
+        resultat, temps, pic = mesurer(fonction, memoire, verbose)
+        resultats.append({
+            'stations': n_stations, 'stage': nom, 'seconds': temps, 'items': items,
+            'throughput': items / temps if temps > 0 else None, 'unit': unit, 'peak_mb': pic,
+            'quality': qualite(resultat) if qualite is not None else {},
+        })
+        print(f"{n_stations:>8} | {nom:<26} | {temps:>9.3f} | {items / temps if temps > 0 else 0:>12.0f} {unit}")
+        return resultat
+
+    # === Données (les CSV sont générés même si trips_csv n'est pas mesurée) ===
+    trip_files = etape('trips_csv', lambda: city.write_trip_csvs(dossier_trajets, n_trips, days=days),
+                       n_trips, 'trajets/s')
+    if trip_files is None:
+        trip_files = city.write_trip_csvs(dossier_trajets, n_trips, days=days)
+
+    df_all = etape('process_trip_files', lambda: aggregate.process_trip_files(trip_files), n_trips, 'trajets/s',
+                   lambda df: {'trajets': len(df), 'stations_trouvees': int(df['start_station_name'].nunique())})
+    if df_all is None and 'compute_usage_counts' in stages:
+        with contextlib.redirect_stdout(io.StringIO()):
+            df_all = aggregate.process_trip_files(trip_files)
+    if 'compute_usage_counts' in stages:
+        info = aggregate.update_station_info_from_trips(df_all)
+        etape('compute_usage_counts', lambda: aggregate.compute_usage_counts(df_all, info), n_trips, 'trajets/s',
+              lambda r: {'usage_total': float(r[0].sum()), 'top_stations': len(r[1])})
+    del df_all
+
+    etape('daily_net_flow', lambda: flux.build_daily_net_flow(trip_files, None), n_trips, 'trajets/s',
+          # Chaque trajet compte une arrivée et un départ : la somme des flux doit être nulle
+          lambda r: {'somme_flux': int(r[0].sum()), 'erreurs': len(r[2])})
+
+    # === Matrices de distances ===
+    station_info = city.station_info()
+    paires = n_stations * n_stations
+    etape('compute_distance_matrix', lambda: aggregate.compute_distance_matrix(station_info), paires, 'paires/s',
+          lambda m: {'distance_moyenne_km': float(np.asarray(m).mean())})
+    npy_path = os.path.join(dossier, "GLOBAL_distance_all.npy")
+    if etape('write_distance_matrix_npy', lambda: aggregate.write_distance_matrix_npy(station_info, npy_path),
+             paires, 'paires/s') is None and any(s in stages for s in ('genetic_algorithm', 'tsp')):
+        with contextlib.redirect_stdout(io.StringIO()):
+            aggregate.write_distance_matrix_npy(station_info, npy_path)
+
+    # === Prévision : entraînement sur days jours, comparaison au jour suivant (tenu à l'écart) ===
+    table = city.flux_table(days=days + 1)
+    flux_prevu = table.iloc[1:, -1].to_numpy(dtype=float)
+    if 'forecast' in stages:
+        csv_path = os.path.join(dossier, "diff_dic.csv")
+        table.iloc[:, :-1].to_csv(csv_path)
+        predictor = BikeFluctuationPredictor(csv_path, lags=7, horizon=1, random_state=seed)
+        prevus = etape('forecast', lambda: predictor.run_forecast(city.station_ids), n_stations, 'stations/s',
+                       lambda p: {'mae': float(np.abs(p[:, 0] - table.iloc[:, -1].to_numpy()).mean()),
+                                  'mae_veille': float(np.abs(table.iloc[:, -2] - table.iloc[:, -1]).mean())})
+        flux_prevu = prevus[1:, 0]
+
+    # === Optimisation ===
+    if any(s in stages for s in ('genetic_algorithm', 'tsp')):
+        distance_matrix, _ = distance_store.load_distance_matrix(npy_path)
+    if 'genetic_algorithm' in stages:
+        ga = GeneticAlgorithm(genome_length=n_stations - 1, population_size=ga_population,
+                              generations=ga_generations, distance_matrix=distance_matrix,
+                              stations=flux_prevu, seed=seed)
+        etape('genetic_algorithm', ga.run, (ga_generations + 1) * ga_population, 'génomes/s',
+              lambda r: {'fitness': float(r[1]), 'arret': r[2], 'cache_hit_rate': ga.cache_stats()['hit_rate']})
+    if 'tsp' in stages:
+        # OR-Tools enregistre la matrice complète : sous-réseau des tsp_max_stations premières stations
+        m = min(n_stations, tsp_max_stations)
+        solver = TSPSolver(distance=np.asarray(distance_matrix[:m, :m]))
+        etape('tsp', lambda: solver.solve(time_limit=tsp_time_limit, metaheuristic='GUIDED_LOCAL_SEARCH'),
+              m, 'noeuds/s', lambda r: {'noeuds': m, 'distance_km': float(r[1]) if r else None})
+    return resultats
+
+
+def version_code():
+    """
+    Révision git du dépôt (suffixe -dirty si modifié), None hors d'un dépôt git.
+    """
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline sur des villes synthétiques.")
+    parser.add_argument("--stations", type=int, nargs="+", default=[2000, 5000, 10000],
+                        help="tailles de réseau mesurées")
+    parser.add_argument("--trips", type=int, default=200_000, help="nombre de trajets synthétiques")
+    parser.add_argument("--days", type=int, default=30, help="nombre de jours de trajets et de flux")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES, help="étapes mesurées")
+    parser.add_argument("--output", default="benchmark_results.json", help="fichier de résultats JSON")
+    parser.add_argument("--workdir", default=None, help="dossier des données générées (temporaire par défaut)")
+    parser.add_argument("--ga-generations", type=int, default=50)
+    parser.add_argument("--ga-population", type=int, default=100)
+    parser.add_argument("--tsp-max-stations", type=int, default=1000)
+    parser.add_argument("--tsp-time-limit", type=float, default=10)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="sans échantillonnage de la mémoire résidente")
+    parser.add_argument("--verbose", action="store_true", help="affiche les sorties des étapes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = [s for s in STAGES if s in args.stages]
+    with contextlib.ExitStack() as pile:
+        workdir = args.workdir or pile.enter_context(tempfile.TemporaryDirectory(prefix="bench_"))
+        print(f"stations | étape                      | temps (s) | débit")
+        resultats = []
+        for n_stations in args.stations:
+            resultats += benchmark_ville(n_stations, args.trips, args.days, args.seed, workdir, stages,
+                                         memoire=not args.no_memory, verbose=args.verbose,
+                                         ga_generations=args.ga_generations, ga_population=args.ga_population,
+                                         tsp_max_stations=args.tsp_max_stations,
+                                         tsp_time_limit=args.tsp_time_limit)
+
+    rapport = {
+        'meta': {
+            'date': pd.Timestamp.now().isoformat(timespec='seconds'),
+            'version': version_code(),
+            'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+            'cpu_count': os.cpu_count(),
+            'params': {k: v for k, v in vars(args).items() if k not in ('output', 'workdir', 'verbose')},
+            # Pic de mémoire résidente du processus sur toute la série (Linux : Ko)
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        'results': resultats,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(rapport, f, indent=1, default=str)
+    print(f"Résultats : {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,127 @@
+import os
+import numpy as np
+import pandas as pd
+
+# ----------------- VILLE SYNTHÉTIQUE REPRODUCTIBLE -----------------
+# Stations, trajets au format Divvy et flux nets journaliers générés à partir d'une graine,
+# à n'importe quelle échelle, pour mesurer le pipeline sans les données réelles.
+# Chaque type de données a son propre générateur aléatoire (graine, numéro) : les stations
+# sont identiques quels que soient le nombre de trajets ou de jours demandés.
+
+# Colonnes des CSV de trajets Divvy (schéma depuis 2020)
+DIVVY_COLUMNS = ['ride_id', 'rideable_type', 'started_at', 'ended_at', 'start_station_name',
+                 'start_station_id', 'end_station_name', 'end_station_id', 'start_lat', 'start_lng',
+                 'end_lat', 'end_lng', 'member_casual']
+RIDEABLE_TYPES = ['electric_bike', 'classic_bike', 'docked_bike']
+
+# Répartition des départs dans la journée : pointes du matin et du soir
+HOURLY_PROFILE = np.array([1, 0.5, 0.3, 0.2, 0.3, 1, 3, 6, 8, 5, 4, 4,
+                           5, 5, 5, 6, 8, 9, 7, 5, 4, 3, 2, 1.5])
+HOURLY_PROFILE = HOURLY_PROFILE / HOURLY_PROFILE.sum()
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    Distance haversine vectorisée (km), comme aggregate.haversine_distance.
+    """
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371 * np.arcsin(np.sqrt(a))
+
+class SyntheticCity:
+    """
+    Réseau de n_stations stations regroupées en quartiers autour de center (lat, lng) :
+      - station_ids : 1..N, dans l'ordre des noms (comme assign_station_ids et flux.to_station_ids),
+      - lat, lng : coordonnées ; popularity : poids très inégaux des stations (loi de Pareto).
+    """
+    def __init__(self, n_stations=2000, seed=0, center=(41.88, -87.63), spread=0.08):
+        self.n_stations = n_stations
+        self.seed = seed
+        rng = self.rng(0)
+        n_quartiers = max(1, n_stations // 100)
+        centres = np.asarray(center) + rng.normal(scale=spread, size=(n_quartiers, 2))
+        quartier = rng.integers(0, n_quartiers, n_stations)
+        coords = centres[quartier] + rng.normal(scale=spread / 8, size=(n_stations, 2))
+        self.lat, self.lng = coords[:, 0], coords[:, 1]
+        self.station_ids = np.arange(1, n_stations + 1)
+        self.names = np.array([f"Station {k:05d}" for k in self.station_ids], dtype=object)
+        self.popularity = rng.pareto(1.5, n_stations) + 1
+        self.popularity /= self.popularity.sum()
+
+    def rng(self, numero):
+        return np.random.default_rng([self.seed, numero])
+
+    def station_info(self):
+        """
+        Retourne {station_id: (lat, lng)}, comme process_station_files.
+        """
+        return {int(sid): (lat, lng) for sid, lat, lng in zip(self.station_ids, self.lat, self.lng)}
+
+    def write_stations_csv(self, folder):
+        path = os.path.join(folder, "Divvy_Stations_synthetic.csv")
+        pd.DataFrame({'station_id': self.station_ids, 'name': self.names,
+                      'lat': self.lat, 'lng': self.lng}).to_csv(path, index=False)
+        return path
+
+    def trips(self, n_trips, start="2020-04-01", days=30):
+        """
+        Trajets au format Divvy (DIVVY_COLUMNS) répartis sur days jours à partir de start :
+        stations de départ et d'arrivée tirées selon leur popularité, heure de départ selon
+        HOURLY_PROFILE, durée = distance à 15 km/h + arrêts, coordonnées bruitées autour de la station.
+        """
+        rng = self.rng(1)
+        depart = rng.choice(self.n_stations, n_trips, p=self.popularity)
+        arrivee = rng.choice(self.n_stations, n_trips, p=self.popularity)
+        jour = rng.integers(0, days, n_trips)
+        heure = rng.choice(24, n_trips, p=HOURLY_PROFILE)
+        secondes = jour * 86400 + heure * 3600 + rng.integers(0, 3600, n_trips)
+        km = haversine_km(self.lat[depart], self.lng[depart], self.lat[arrivee], self.lng[arrivee])
+        duree = km / 15 * 3600 + 120 + rng.exponential(300, n_trips)
+        debut = pd.Timestamp(start)
+        started = debut + pd.to_timedelta(secondes, unit='s')
+        ended = started + pd.to_timedelta(np.rint(duree), unit='s')
+        bruit = rng.normal(scale=1e-4, size=(n_trips, 4))
+        return pd.DataFrame({
+            'ride_id': pd.Series(rng.integers(0, 2**63, n_trips)).map('{:016X}'.format),
+            'rideable_type': np.array(RIDEABLE_TYPES)[rng.choice(3, n_trips, p=[0.4, 0.4, 0.2])],
+            'started_at': started,
+            'ended_at': ended,
+            'start_station_name': self.names[depart],
+            'start_station_id': self.station_ids[depart],
+            'end_station_name': self.names[arrivee],
+            'end_station_id': self.station_ids[arrivee],
+            'start_lat': self.lat[depart] + bruit[:, 0],
+            'start_lng': self.lng[depart] + bruit[:, 1],
+            'end_lat': self.lat[arrivee] + bruit[:, 2],
+            'end_lng': self.lng[arrivee] + bruit[:, 3],
+            'member_casual': np.where(rng.random(n_trips) < 0.7, 'member', 'casual'),
+        }, columns=DIVVY_COLUMNS)
+
+    def write_trip_csvs(self, folder, n_trips, start="2020-04-01", days=30):
+        """
+        Écrit les trajets dans un CSV par mois de départ (<AAAAMM>-divvy-tripdata.csv),
+        dates au format Divvy. Retourne la liste des fichiers.
+        """
+        os.makedirs(folder, exist_ok=True)
+        df = self.trips(n_trips, start, days).sort_values('started_at', kind='stable')
+        fichiers = []
+        for mois, groupe in df.groupby(df['started_at'].dt.strftime('%Y%m'), sort=True):
+            path = os.path.join(folder, f"{mois}-divvy-tripdata.csv")
+            groupe.to_csv(path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+            fichiers.append(path)
+        return fichiers
+
+    def flux_table(self, start="2020-04-01", days=30):
+        """
+        Flux nets journaliers au format diff_dic.csv (index station_id, colonnes 'AAAA-MM-JJ') :
+        arrivées - départs, chaque station ayant un déséquilibre propre modulé par jour de semaine.
+        """
+        rng = self.rng(2)
+        dates = pd.date_range(start, periods=days, freq='D')
+        semaine = np.where(dates.dayofweek < 5, 1.0, 0.6)
+        volume = self.popularity * self.n_stations * 20  # trajets par jour et par station en moyenne
+        desequilibre = rng.normal(scale=0.15, size=self.n_stations)
+        lam_arrivees = np.outer(volume * (1 + desequilibre).clip(0.1), semaine)
+        lam_departs = np.outer(volume * (1 - desequilibre).clip(0.1), semaine)
+        flux = rng.poisson(lam_arrivees) - rng.poisson(lam_departs)
+        return pd.DataFrame(flux, index=pd.Index(self.station_ids, name='station_id'),
+                            columns=dates.strftime('%Y-%m-%d'))
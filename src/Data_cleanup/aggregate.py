@@ -1,9 +1,42 @@
 import os
+import sys
 import glob
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from sklearn.neighbors import BallTree
+try:
+    from Data_cleanup.distance_store import station_ids_path, record_source, save_knn_graph
+    from Data_cleanup.trip_aggregates import TripAggregates, DURATION_BINS
+    from Data_cleanup.trip_cache import write_trip_cache, read_trip_cache
+    from Data_cleanup.manifest import FileManifest
+    from Instrumentation import metrics
+except ImportError:  # exécuté comme script depuis Data_cleanup/
+    from distance_store import station_ids_path, record_source, save_knn_graph
+    from trip_aggregates import TripAggregates, DURATION_BINS
+    from trip_cache import write_trip_cache, read_trip_cache
+    from manifest import FileManifest
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Instrumentation import metrics
+
+# Colonnes des CSV de trajets utilisées par le pipeline (noms normalisés) et leurs types
+# (ride_id distingue deux trajets identiques par ailleurs : clean_data ne supprime que les vrais doublons)
+TRIP_COLUMNS = {
+    'ride_id': str,
+    'rideable_type': str,
+    'started_at': str,
+    'ended_at': str,
+    'start_station_name': str,
+    'end_station_name': str,
+    'start_lat': np.float64,
+    'start_lng': np.float64,
+    'end_lat': np.float64,
+    'end_lng': np.float64,
+}
 
 # ----------------- UTILITAIRES ET FONCTIONS DE CALCUL -----------------
 def haversine_distance(lat1, lon1, lat2, lon2):
@@ -18,24 +51,89 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
     return R * c
 
+def station_coordinates(station_info):
+    """
+    Retourne les identifiants triés et les tableaux de latitudes / longitudes
+    d'un dictionnaire {station_id: (lat, lng)}.
+    """
+    stations = sorted(station_info.keys())
+    coords = np.array([station_info[s] for s in stations], dtype=float).reshape(-1, 2)
+    return stations, coords[:, 0], coords[:, 1]
+
+def distance_matrix_blocks(lat, lng, chunk_size=1024, dtype=np.float32):
+    """
+    Génère la matrice des distances haversine par blocs de lignes (calcul vectorisé).
+    Chaque bloc (start, block) couvre les lignes start:start+len(block) ; la mémoire
+    utilisée est bornée par chunk_size x N valeurs.
+    """
+    for start in range(0, len(lat), chunk_size):
+        stop = min(start + chunk_size, len(lat))
+        block = haversine_distance(lat[start:stop, None], lng[start:stop, None],
+                                   lat[None, :], lng[None, :])
+        yield start, block.astype(dtype, copy=False)
+
 def compute_distance_matrix(station_info):
     """
     Calcule la matrice des distances pour un dictionnaire {station_id: (lat, lng)}.
     La matrice retournée est un DataFrame pandas.
     """
-    stations = sorted(station_info.keys())
-    data = []
-    for s1 in stations:
-        row = []
-        lat1, lon1 = station_info[s1]
-        for s2 in stations:
-            lat2, lon2 = station_info[s2]
-            row.append(haversine_distance(lat1, lon1, lat2, lon2))
-        data.append(row)
+    stations, lat, lng = station_coordinates(station_info)
+    data = np.empty((len(stations), len(stations)))
+    for start, block in distance_matrix_blocks(lat, lng, dtype=float):
+        data[start:start + len(block)] = block
     df_dist = pd.DataFrame(data, index=stations, columns=stations)
     df_dist.index.name = 'station_id'
     return df_dist
 
+def write_distance_matrix_npy(station_info, npy_path, chunk_size=1024):
+    """
+    Écrit la matrice des distances (float32) directement dans un fichier .npy mappé
+    en mémoire, bloc par bloc, sans jamais construire la matrice complète en RAM.
+    Les identifiants de stations (ordre des lignes/colonnes) sont écrits à côté
+    dans <nom>_station_ids.npy. Retourne la liste des identifiants.
+    """
+    stations, lat, lng = station_coordinates(station_info)
+    matrix = np.lib.format.open_memmap(npy_path, mode='w+', dtype=np.float32,
+                                       shape=(len(stations), len(stations)))
+    for start, block in distance_matrix_blocks(lat, lng, chunk_size):
+        matrix[start:start + len(block)] = block
+    matrix.flush()
+    del matrix
+    np.save(station_ids_path(npy_path), np.asarray(stations))
+    return stations
+
+def export_distance_csv(npy_path, csv_path, chunk_size=1024):
+    """
+    Export CSV (compatibilité) d'une matrice .npy, écrit par blocs de lignes.
+    """
+    matrix = np.load(npy_path, mmap_mode='r')
+    stations = np.load(station_ids_path(npy_path), allow_pickle=True)
+    for start in range(0, len(stations), chunk_size):
+        stop = min(start + chunk_size, len(stations))
+        df = pd.DataFrame(matrix[start:stop], index=stations[start:stop], columns=stations)
+        df.index.name = 'station_id'
+        df.to_csv(csv_path, mode='w' if start == 0 else 'a', header=start == 0)
+    # Le CSV exporté est plus récent que le .npy : sa signature évite une reconversion float64
+    record_source(npy_path, csv_path)
+
+def build_knn_graph(station_info, k=10):
+    """
+    Construit un index spatial (BallTree, métrique haversine) sur les coordonnées des
+    stations et en extrait le graphe des k plus proches voisins de chaque station.
+    Retourne (stations, neighbors, distances) :
+      - neighbors[i] : indices (dans l'ordre trié des stations, comme la matrice de
+        distances) des k voisins de la station i, du plus proche au plus lointain,
+      - distances[i] : distances correspondantes en km (float32).
+    Mémoire en O(k x N) au lieu de O(N²).
+    """
+    stations, lat, lng = station_coordinates(station_info)
+    k = min(k, len(stations) - 1)
+    tree = BallTree(np.radians(np.column_stack([lat, lng])), metric='haversine')
+    # k + 1 voisins : le plus proche d'une station est elle-même
+    dist, ind = tree.query(np.radians(np.column_stack([lat, lng])), k=k + 1)
+    R = 6371  # Rayon de la Terre en km
+    return stations, ind[:, 1:], (dist[:, 1:] * R).astype(np.float32)
+
 def unify_coordinates(df):
     """
     Unifie les coordonnées pour chaque station en calculant la moyenne des coordonnées.
@@ -159,6 +257,37 @@ def process_trip_csv(file_path):
     df, station_mapping = assign_station_ids(df)
     return df
 
+def normalize_column(name):
+    """
+    Nom de colonne normalisé, comme dans clean_data.
+    """
+    return name.strip().lower().replace(' ', '_')
+
+def read_trip_chunks(file_path, chunksize=500_000):
+    """
+    Lecture d'un CSV de trajets par morceaux de chunksize lignes, limitée aux
+    colonnes utiles (TRIP_COLUMNS) avec des types explicites.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    colonnes = {col: normalize_column(col) for col in header if normalize_column(col) in TRIP_COLUMNS}
+    return pd.read_csv(file_path, usecols=list(colonnes),
+                       dtype={col: TRIP_COLUMNS[nom] for col, nom in colonnes.items()},
+                       chunksize=chunksize)
+
+def process_trip_csv_streaming(file_path, chunksize=500_000):
+    """
+    Traite un CSV de trajets morceau par morceau (nettoyage et enrichissement par morceau)
+    et retourne ses agrégats (TripAggregates) au lieu du DataFrame complet.
+    Remarque : les valeurs manquantes sont complétées avec le mode / la moyenne du morceau
+    et les doublons ne sont supprimés qu'au sein d'un même morceau.
+    """
+    aggregates = TripAggregates()
+    for chunk in read_trip_chunks(file_path, chunksize):
+        chunk = clean_data(chunk)
+        chunk = feature_engineering(chunk)
+        aggregates.update(chunk)
+    return aggregates
+
 def process_station_csv(file_path):
     """
     Traite un CSV listant les stations (par ex. 'Divvy_Stations_2015'):
@@ -213,38 +342,129 @@ def process_station_files(station_files):
             print(f"Erreur dans le fichier station {file}: {e}")
     return global_station_info
 
-def process_trip_files(trip_files):
+def map_files(fonction, files, workers=1):
     """
-    Traite tous les CSV de trajets et retourne un DataFrame agrégé.
+    Applique fonction à chaque fichier, dans un pool de workers processus si workers > 1.
+    Produit, dans l'ordre des fichiers, des tuples (fichier, résultat, erreur) :
+    une erreur dans un fichier (message, résultat None) n'interrompt pas les autres.
+    """
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            yield from executor.map(_run_on_file, [fonction] * len(files), files)
+    else:
+        for file in files:
+            yield _run_on_file(fonction, file)
+
+def _run_on_file(fonction, file):
+    try:
+        return file, fonction(file), None
+    except Exception as e:
+        # Message seulement : certaines exceptions ne passent pas d'un processus à l'autre
+        return file, None, str(e)
+
+def process_trip_files(trip_files, workers=1):
+    """
+    Traite tous les CSV de trajets (en parallèle si workers > 1) et retourne un DataFrame agrégé.
+    Les identifiants de stations sont réattribués sur l'ensemble des trajets : ceux de
+    process_trip_csv sont numérotés fichier par fichier et ne concordent pas entre fichiers.
     """
     trips_list = []
-    for file in trip_files:
-        try:
-            df_trip = process_trip_csv(file)
+    for file, df_trip, erreur in map_files(process_trip_csv, trip_files, workers):
+        if erreur is None:
             trips_list.append(df_trip)
             print(f"Trip CSV traité : {file}")
-        except Exception as e:
-            print(f"Erreur lors du traitement du fichier trip {file}: {e}")
+        else:
+            print(f"Erreur lors du traitement du fichier trip {file}: {erreur}")
     if trips_list:
-        return pd.concat(trips_list, ignore_index=True)
+        df_all, _ = assign_station_ids(pd.concat(trips_list, ignore_index=True))
+        return df_all
     else:
         return None
 
+def process_trip_files_streaming(trip_files, chunksize=500_000, workers=1):
+    """
+    Traite tous les CSV de trajets en flux (un fichier par worker si workers > 1) et retourne
+    leurs agrégats cumulés (None si aucun fichier n'a pu être traité). Un fichier en erreur
+    n'est pas compté. Les identifiants de stations sont attribués globalement par TripAggregates.
+    """
+    aggregates = None
+    traitement = partial(process_trip_csv_streaming, chunksize=chunksize)
+    for file, partiel, erreur in map_files(traitement, trip_files, workers):
+        if erreur is None:
+            aggregates = partiel if aggregates is None else aggregates.merge(partiel)
+            print(f"Trip CSV traité : {file}")
+        else:
+            print(f"Erreur lors du traitement du fichier trip {file}: {erreur}")
+    return aggregates
+
+def process_trip_files_incremental(trip_files, manifest_folder, chunksize=500_000, workers=1):
+    """
+    Comme process_trip_files_streaming, mais seuls les fichiers nouveaux ou modifiés depuis
+    le dernier passage sont lus (manifeste : chemin, taille, date, empreinte du contenu).
+    Les agrégats partiels de chaque fichier sont conservés sur disque ; le résultat est la
+    fusion des agrégats de tous les fichiers présents (les fichiers disparus sont retirés).
+    """
+    manifest = FileManifest(manifest_folder)
+    retires = manifest.forget_missing(trip_files)
+    a_traiter = manifest.pending(trip_files)
+    print(f"Fichiers de trajets : {len(trip_files) - len(a_traiter)} inchangés, "
+          f"{len(a_traiter)} à traiter, {len(retires)} retirés")
+    traitement = partial(process_trip_csv_streaming, chunksize=chunksize)
+    for file, partiel, erreur in map_files(traitement, a_traiter, workers):
+        if erreur is None:
+            manifest.record(file, partiel)
+            print(f"Trip CSV traité : {file}")
+        else:
+            manifest.discard(file)
+            print(f"Erreur lors du traitement du fichier trip {file}: {erreur}")
+    manifest.save()
+
+    aggregates = None
+    for partiel in manifest.partials(trip_files):
+        aggregates = partiel if aggregates is None else aggregates.merge(partiel)
+    return aggregates
+
+def grouped_mean(keys, values, groups):
+    """
+    Moyennes par clé (NaN ignorés) de chaque colonne de values (n_lignes x n_colonnes),
+    pour chacune des clés de groups, en une passe : un seul tri stable par clé, puis
+    une somme par tranche contiguë.
+    Chaque tranche garde l'ordre d'origine des lignes et est sommée par numpy comme
+    Series.mean, d'où des résultats identiques au bit près à un filtrage clé par clé
+    (un groupby().mean() pandas utilise une sommation compensée légèrement différente).
+    Retourne un tableau (len(groups) x n_colonnes), NaN pour une clé absente.
+    """
+    ordre = np.argsort(keys, kind='stable')
+    keys = keys[ordre]
+    values = values[ordre]
+    valides = ~np.isnan(values)
+    values = np.where(valides, values, 0.0)
+    debuts = np.searchsorted(keys, groups, side='left')
+    fins = np.searchsorted(keys, groups, side='right')
+    moyennes = np.full((len(groups), values.shape[1]), np.nan)
+    for i, (debut, fin) in enumerate(zip(debuts, fins)):
+        for j in range(values.shape[1]):
+            n = np.count_nonzero(valides[debut:fin, j])
+            if n:
+                moyennes[i, j] = values[debut:fin, j].sum() / n
+    return moyennes
+
 def update_station_info_from_trips(df_all):
     """
     Extrait les informations de stations à partir du DataFrame de trajets.
     Retourne un dictionnaire {station_id: (mean_lat, mean_lng)}.
+    La moyenne porte sur les coordonnées de tous les départs et arrivées de la station.
     """
     df_all, computed_mapping = assign_station_ids(df_all)
-    computed_station_info = {}
-    for name, sid in computed_mapping.items():
-        subset_start = df_all[df_all['start_station_id'] == sid][['start_lat', 'start_lng']]
-        subset_end = df_all[df_all['end_station_id'] == sid][['end_lat', 'end_lng']]
-        lat_vals = pd.concat([subset_start['start_lat'], subset_end['end_lat']], ignore_index=True)
-        lng_vals = pd.concat([subset_start['start_lng'], subset_end['end_lng']], ignore_index=True)
-        if not lat_vals.empty and not lng_vals.empty:
-            computed_station_info[sid] = (lat_vals.mean(), lng_vals.mean())
-    return computed_station_info
+    if not computed_mapping:
+        return {}
+    sids = np.fromiter(computed_mapping.values(), dtype=np.int64, count=len(computed_mapping))
+    ids = np.concatenate([df_all['start_station_id'].to_numpy(), df_all['end_station_id'].to_numpy()])
+    coords = np.concatenate([df_all[['start_lat', 'start_lng']].to_numpy(dtype=float),
+                             df_all[['end_lat', 'end_lng']].to_numpy(dtype=float)])
+    moyennes = grouped_mean(ids, coords, sids)
+    presentes = np.isin(sids, ids)
+    return {int(sid): (moyennes[i, 0], moyennes[i, 1]) for i, sid in enumerate(sids) if presentes[i]}
 
 def merge_station_info(global_station_info, computed_station_info):
     """
@@ -256,34 +476,70 @@ def merge_station_info(global_station_info, computed_station_info):
             global_station_info[sid] = coords
     return global_station_info
 
+def station_usage(df_all):
+    """
+    Nombre de départs + arrivées par station_id, en une seule passe sur chaque colonne.
+    """
+    return df_all['start_station_id'].value_counts().add(
+        df_all['end_station_id'].value_counts(), fill_value=0)
+
 def compute_usage_counts(df_all, global_station_info):
     """
     Calcule l'usage total (nombre de départs + arrivées) pour chaque station.
     Retourne la série usage_count et la liste des top 20% des stations.
     """
-    usage_count = pd.Series(0, index=global_station_info.keys(), dtype=float)
-    for sid in global_station_info.keys():
-        count_start = (df_all['start_station_id'] == sid).sum()
-        count_end = (df_all['end_station_id'] == sid).sum()
-        usage_count[sid] = count_start + count_end
+    return rank_usage(station_usage(df_all), global_station_info)
+
+def rank_usage(usage, global_station_info):
+    """
+    Usage (indexé par station_id) réindexé sur les stations connues, et top 20%.
+    """
+    usage_count = pd.Series(usage.reindex(list(global_station_info.keys()), fill_value=0).to_numpy(dtype=float),
+                            index=global_station_info.keys(), dtype=float)
     usage_sorted = usage_count.sort_values(ascending=False)
     cutoff = int(np.ceil(len(usage_sorted) * 0.2))  # Top 20%
     top_stations = usage_sorted.index[:cutoff]
     return usage_count, top_stations
 
-def save_distance_matrices(global_station_info, top_stations, output_folder):
+def save_distance_matrices(global_station_info, top_stations, output_folder, export_csv=True):
     """
-    Calcule et sauvegarde les matrices de distance pour toutes les stations
-    et pour le top 20% des stations les plus utilisées.
+    Calcule et sauvegarde les matrices de distance (float32, .npy mappé en mémoire)
+    pour toutes les stations et pour le top 20% des stations les plus utilisées.
+    Si export_csv est vrai, une copie CSV est aussi écrite pour compatibilité.
     """
-    df_dist_all = compute_distance_matrix(global_station_info)
-    df_dist_all.to_csv(os.path.join(output_folder, "GLOBAL_distance_all.csv"))
-    
     station_info_top = {s: global_station_info[s] for s in top_stations}
-    df_dist_top = compute_distance_matrix(station_info_top)
-    df_dist_top.to_csv(os.path.join(output_folder, "GLOBAL_distance_top20pct.csv"))
+    for name, station_info in [("GLOBAL_distance_all", global_station_info),
+                               ("GLOBAL_distance_top20pct", station_info_top)]:
+        npy_path = os.path.join(output_folder, name + ".npy")
+        write_distance_matrix_npy(station_info, npy_path)
+        if export_csv:
+            export_distance_csv(npy_path, os.path.join(output_folder, name + ".csv"))
     print("Matrices de distances sauvegardées.")
 
+def save_duration_histogram(aggregates, output_folder):
+    """
+    Sauvegarde l'histogramme des durées de trajets à partir des agrégats (mode flux).
+    """
+    plt.figure(figsize=(8, 5))
+    plt.bar(DURATION_BINS[:-1], aggregates.duration_hist, width=np.diff(DURATION_BINS), align='edge')
+    plt.title("Distribution des durées des trajets")
+    plt.savefig(os.path.join(output_folder, "aggregated_trip_duration_hist.png"))
+    plt.close()
+    print("Graphique sauvegardé.")
+
+def save_flow_table(aggregates, output_folder):
+    """
+    Sauvegarde les flux nets journaliers (format diff_dic.csv) et le mapping nom -> identifiant.
+    """
+    table, mapping = aggregates.flow_table()
+    if table.empty:
+        print("Aucun flux journalier à sauvegarder.")
+        return
+    table.to_csv(os.path.join(output_folder, "diff_dic.csv"))
+    pd.DataFrame(list(mapping.items()), columns=["station_name", "station_id"]).to_csv(
+        os.path.join(output_folder, "station_name_to_id.csv"), index=False)
+    print("Flux journaliers sauvegardés :", os.path.join(output_folder, "diff_dic.csv"))
+
 def save_graph(df_all, output_folder):
     """
     Sauvegarde un histogramme de la distribution des durées de trajets.
@@ -296,20 +552,67 @@ def save_graph(df_all, output_folder):
     print("Graphique sauvegardé.")
 
 # ----------------- FONCTION MAIN -----------------
-def main():
+# Colonnes du cache utilisées par main() (stations, usage, coordonnées, histogramme)
+TRIP_CACHE_COLUMNS = ['start_station_name', 'end_station_name', 'start_lat', 'start_lng',
+                      'end_lat', 'end_lng', 'trip_duration']
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Agrégation des données Divvy (trajets et stations).")
+    # Chemins modifiables selon votre structure
+    parser.add_argument("--input", default="/home/timeworid/Documents/AI Project/divvydata",
+                        help="dossier des CSV Divvy (parcouru récursivement)")
+    parser.add_argument("--output", default="/home/timeworid/Documents/AI Project/data_output",
+                        help="dossier de sortie")
+    parser.add_argument("--stream", action="store_true",
+                        help="lecture des trajets par morceaux, sans charger la table complète")
+    parser.add_argument("--chunksize", type=int, default=500_000,
+                        help="nombre de lignes par morceau en mode --stream")
+    parser.add_argument("--incremental", action="store_true",
+                        help="mode flux limité aux CSV nouveaux ou modifiés (manifeste dans <output>/manifest)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="nombre de processus pour traiter les CSV de trajets en parallèle")
+    parser.add_argument("--cache", default=None,
+                        help="cache Parquet des trajets traités (défaut : <output>/trips_parquet)")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="relit les trajets depuis le cache Parquet au lieu des CSV")
+    parser.add_argument("--months", nargs="+", default=None,
+                        help="mois à relire depuis le cache (AAAA-MM), tous par défaut")
+    parser.add_argument("--export-csv", action="store_true",
+                        help="écrit aussi aggregated_trips.csv (compatibilité)")
+    parser.add_argument("--metrics", default=None,
+                        help="fichier JSON des mesures de l'exécution (durées, compteurs)")
+    parser.add_argument("--profile", choices=["cprofile", "sample"], default=None,
+                        help="profilage de l'exécution, résumé dans le fichier --metrics")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics or args.profile:
+        metrics.start_run(args.profile)
+    try:
+        run_aggregation(args)
+    finally:
+        if metrics.is_enabled():
+            metrics.finish_run(args.metrics or os.path.join(args.output, "aggregate_metrics.json"))
+
+def run_aggregation(args):
     """
-    Fonction principale :
+    Agrégation complète (voir parse_args pour les options) :
       1. Définit les dossiers d'entrée et de sortie.
       2. Recherche récursive des CSV dans le dossier d'entrée.
-      3. Traite et agrège les CSV de trajets.
+      3. Traite et agrège les CSV de trajets et les enregistre dans le cache Parquet
+         (ou les relit depuis ce cache avec --from-cache, en ne chargeant que les colonnes utiles).
+         En flux avec --stream, seuls les agrégats par station et l'histogramme des durées
+         sont conservés : ni cache ni aggregated_trips.csv, mais les flux journaliers (diff_dic.csv).
+         Avec --incremental, seuls les CSV nouveaux ou modifiés depuis le dernier passage sont lus.
       4. Met à jour la liste globale des stations à partir des trajets et des CSV stations.
       5. Calcule l'usage des stations et extrait le top 20%.
-      6. Calcule et sauvegarde les matrices de distances.
+      6. Calcule et sauvegarde les matrices de distances et le graphe k-NN des stations.
       7. Sauvegarde un graphique d'analyse.
     """
-    # Chemins modifiables selon votre structure
-    input_folder = "/home/timeworid/Documents/AI Project/divvydata"
-    output_folder = "/home/timeworid/Documents/AI Project/data_output"
+    input_folder = args.input
+    output_folder = args.output
+    cache_folder = args.cache or os.path.join(output_folder, "trips_parquet")
     os.makedirs(output_folder, exist_ok=True)
     
     # 1. Recherche des fichiers CSV dans tous les sous-dossiers
@@ -323,30 +626,75 @@ def main():
     for f in station_files:
         print(" -", f)
     
+    metrics.count("aggregate.files", len(trip_files))
+
     # 2. Traitement des CSV de stations
-    global_station_info = process_station_files(station_files)
+    with metrics.timer("aggregate.station_files"):
+        global_station_info = process_station_files(station_files)
     
-    # 3. Traitement et agrégation des CSV de trajets
-    df_all = process_trip_files(trip_files)
-    if df_all is None:
-        print("Aucune donnée de trajets traitée.")
-        return
-    agg_csv = os.path.join(output_folder, "aggregated_trips.csv")
-    df_all.to_csv(agg_csv, index=False)
-    print("Données de trajets agrégées sauvegardées :", agg_csv)
-    
-    # 4. Mise à jour de la liste des stations à partir des trajets
-    computed_station_info = update_station_info_from_trips(df_all)
-    global_station_info = merge_station_info(global_station_info, computed_station_info)
-    
-    # 5. Calcul de l'usage des stations et extraction du top 20%
-    usage_count, top_stations = compute_usage_counts(df_all, global_station_info)
+    if args.stream or args.incremental:
+        # 3. Agrégation en flux des CSV de trajets
+        with metrics.timer("aggregate.trip_files"):
+            if args.incremental:
+                aggregates = process_trip_files_incremental(trip_files, os.path.join(output_folder, "manifest"),
+                                                            args.chunksize, args.workers)
+            else:
+                aggregates = process_trip_files_streaming(trip_files, args.chunksize, args.workers)
+        if aggregates is None:
+            print("Aucune donnée de trajets traitée.")
+            return
+        print(f"Trajets agrégés : {aggregates.n_trips}")
+        metrics.items("aggregate.trip_files", aggregates.n_trips)
+        save_flow_table(aggregates, output_folder)
+
+        # 4. Mise à jour de la liste des stations à partir des agrégats
+        computed_station_info = aggregates.station_info()
+        global_station_info = merge_station_info(global_station_info, computed_station_info)
+
+        # 5. Calcul de l'usage des stations et extraction du top 20%
+        usage_count, top_stations = rank_usage(aggregates.usage_by_station_id(), global_station_info)
+    else:
+        # 3. Traitement et agrégation des CSV de trajets (ou relecture du cache)
+        with metrics.timer("aggregate.trip_files"):
+            if args.from_cache:
+                df_all = read_trip_cache(cache_folder, columns=TRIP_CACHE_COLUMNS, months=args.months)
+                print(f"Trajets relus depuis le cache : {len(df_all)}")
+            else:
+                df_all = process_trip_files(trip_files, args.workers)
+        if df_all is None or df_all.empty:
+            print("Aucune donnée de trajets traitée.")
+            return
+        metrics.items("aggregate.trip_files", len(df_all))
+        if not args.from_cache:
+            with metrics.timer("aggregate.write_trip_cache"):
+                write_trip_cache(df_all, cache_folder)
+        if args.export_csv:
+            agg_csv = os.path.join(output_folder, "aggregated_trips.csv")
+            df_all.to_csv(agg_csv, index=False)
+            print("Données de trajets agrégées sauvegardées :", agg_csv)
+
+        # 4. Mise à jour de la liste des stations à partir des trajets
+        with metrics.timer("aggregate.station_info"):
+            computed_station_info = update_station_info_from_trips(df_all)
+        global_station_info = merge_station_info(global_station_info, computed_station_info)
+
+        # 5. Calcul de l'usage des stations et extraction du top 20%
+        with metrics.timer("aggregate.usage_counts"):
+            usage_count, top_stations = compute_usage_counts(df_all, global_station_info)
     
-    # 6. Calcul et sauvegarde des matrices de distance
-    save_distance_matrices(global_station_info, top_stations, output_folder)
+    # 6. Calcul et sauvegarde des matrices de distance et du graphe des plus proches voisins
+    metrics.count("aggregate.stations", len(global_station_info))
+    with metrics.timer("aggregate.distance_matrices"):
+        save_distance_matrices(global_station_info, top_stations, output_folder)
+    with metrics.timer("aggregate.knn_graph"):
+        save_knn_graph(os.path.join(output_folder, "GLOBAL_knn_graph.npz"),
+                       *build_knn_graph(global_station_info))
     
     # 7. Sauvegarde d'un graphique d'analyse
-    save_graph(df_all, output_folder)
+    if args.stream or args.incremental:
+        save_duration_histogram(aggregates, output_folder)
+    else:
+        save_graph(df_all, output_folder)
     
     print("Traitement global terminé. Résultats dans :", output_folder)
 
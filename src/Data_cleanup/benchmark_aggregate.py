@@ -0,0 +1,103 @@
+# Benchmark de l'agrégation par station (compute_usage_counts, update_station_info_from_trips)
+# sur un jeu de trajets synthétique, comparé aux anciennes boucles station par station.
+# À lancer depuis src/ : python -m Data_cleanup.benchmark_aggregate [nb_trajets] [nb_stations]
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from Data_cleanup.aggregate import assign_station_ids, compute_usage_counts, update_station_info_from_trips
+
+
+def trajets_synthetiques(n_trips=10_000_000, n_stations=600, seed=0):
+    """
+    Génère un DataFrame de trajets au format Divvy (noms et coordonnées de départ/arrivée).
+    Les coordonnées sont bruitées autour de la position de chaque station, comme dans les données réelles.
+    """
+    rng = np.random.default_rng(seed)
+    noms = np.array([f"station {k}" for k in range(n_stations)], dtype=object)
+    centres = np.column_stack([41.75 + rng.random(n_stations) * 0.3, -87.8 + rng.random(n_stations) * 0.3])
+    # Popularité très inégale entre stations
+    popularite = rng.pareto(1.5, n_stations) + 1
+    popularite /= popularite.sum()
+    depart = rng.choice(n_stations, n_trips, p=popularite)
+    arrivee = rng.choice(n_stations, n_trips, p=popularite)
+    bruit = rng.normal(scale=1e-4, size=(n_trips, 4))
+    return pd.DataFrame({
+        'start_station_name': noms[depart],
+        'end_station_name': noms[arrivee],
+        'start_lat': centres[depart, 0] + bruit[:, 0],
+        'start_lng': centres[depart, 1] + bruit[:, 1],
+        'end_lat': centres[arrivee, 0] + bruit[:, 2],
+        'end_lng': centres[arrivee, 1] + bruit[:, 3],
+    })
+
+
+# Anciennes implémentations (deux parcours complets de df_all par station), pour comparaison
+def usage_counts_boucle(df_all, global_station_info):
+    usage_count = pd.Series(0, index=global_station_info.keys(), dtype=float)
+    for sid in global_station_info.keys():
+        count_start = (df_all['start_station_id'] == sid).sum()
+        count_end = (df_all['end_station_id'] == sid).sum()
+        usage_count[sid] = count_start + count_end
+    usage_sorted = usage_count.sort_values(ascending=False)
+    cutoff = int(np.ceil(len(usage_sorted) * 0.2))
+    return usage_count, usage_sorted.index[:cutoff]
+
+
+def station_info_boucle(df_all):
+    df_all, computed_mapping = assign_station_ids(df_all)
+    computed_station_info = {}
+    for name, sid in computed_mapping.items():
+        subset_start = df_all[df_all['start_station_id'] == sid][['start_lat', 'start_lng']]
+        subset_end = df_all[df_all['end_station_id'] == sid][['end_lat', 'end_lng']]
+        lat_vals = pd.concat([subset_start['start_lat'], subset_end['end_lat']], ignore_index=True)
+        lng_vals = pd.concat([subset_start['start_lng'], subset_end['end_lng']], ignore_index=True)
+        if not lat_vals.empty and not lng_vals.empty:
+            computed_station_info[sid] = (lat_vals.mean(), lng_vals.mean())
+    return computed_station_info
+
+
+def chronometrer(fonction, *args):
+    debut = time.perf_counter()
+    resultat = fonction(*args)
+    return resultat, time.perf_counter() - debut
+
+
+def rapport_agregation(n_trips=10_000_000, n_stations=600, seed=0, boucles=True):
+    """
+    Mesure les versions vectorisées (et, si boucles, les anciennes boucles) et vérifie
+    que les résultats sont identiques. Retourne une liste de dictionnaires {etape, version, temps}.
+    """
+    df_all = trajets_synthetiques(n_trips, n_stations, seed)
+    resultats = []
+
+    info, temps = chronometrer(update_station_info_from_trips, df_all)
+    resultats.append({'etape': 'update_station_info_from_trips', 'version': 'vectorisée', 'temps': temps})
+    (usage, top), temps = chronometrer(compute_usage_counts, df_all, info)
+    resultats.append({'etape': 'compute_usage_counts', 'version': 'vectorisée', 'temps': temps})
+
+    if boucles:
+        info_ref, temps = chronometrer(station_info_boucle, df_all)
+        resultats.append({'etape': 'update_station_info_from_trips', 'version': 'boucle', 'temps': temps})
+        (usage_ref, top_ref), temps = chronometrer(usage_counts_boucle, df_all, info_ref)
+        resultats.append({'etape': 'compute_usage_counts', 'version': 'boucle', 'temps': temps})
+        # Les sorties doivent être identiques au bit près
+        if info != info_ref:
+            raise RuntimeError("Coordonnées moyennes différentes de la version en boucle")
+        if not usage.equals(usage_ref) or not top.equals(top_ref):
+            raise RuntimeError("usage_count / top_stations différents de la version en boucle")
+    return resultats
+
+
+def main():
+    n_trips = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    n_stations = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    print(f"Trajets synthétiques : {n_trips}, stations : {n_stations}")
+    print("étape                          | version    | temps (s)")
+    for r in rapport_agregation(n_trips, n_stations):
+        print(f"{r['etape']:<30} | {r['version']:<10} | {r['temps']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# ----------------- STOCKAGE BINAIRE DES MATRICES DE DISTANCES -----------------
+# Format : <nom>.npy (matrice N x N float32, lignes/colonnes dans l'ordre des stations)
+#          <nom>_station_ids.npy (identifiants des stations, dans le même ordre)
+#          <nom>_source.json (signature du CSV correspondant au .npy : taille, date de modification)
+
+# Matrices déjà chargées : le même tableau (lecture seule) est partagé par tous les appelants
+_loaded = {}
+
+def station_ids_path(npy_path):
+    """
+    Chemin du fichier des identifiants de stations associé à une matrice .npy.
+    """
+    return os.path.splitext(npy_path)[0] + "_station_ids.npy"
+
+def source_path(npy_path):
+    """
+    Chemin du fichier de signature du CSV associé à une matrice .npy.
+    """
+    return os.path.splitext(npy_path)[0] + "_source.json"
+
+def csv_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def record_source(npy_path, csv_path):
+    """
+    Enregistre que le .npy et le CSV contiennent la même matrice (CSV converti en .npy,
+    ou CSV exporté depuis le .npy) : le .npy ne sera pas reconverti tant que le CSV ne change pas.
+    """
+    with open(source_path(npy_path), 'w') as f:
+        json.dump(csv_signature(csv_path), f)
+
+def is_up_to_date(npy_path, csv_path):
+    if not os.path.exists(npy_path) or not os.path.exists(station_ids_path(npy_path)):
+        return False
+    if os.path.exists(source_path(npy_path)):
+        with open(source_path(npy_path)) as f:
+            return json.load(f) == csv_signature(csv_path)
+    # .npy sans signature : on se fie aux dates de modification
+    return os.path.getmtime(npy_path) >= os.path.getmtime(csv_path)
+
+def convert_csv_to_npy(csv_path, npy_path):
+    """
+    Convertit une matrice CSV (index = station_id) au format binaire .npy (float32) + identifiants.
+    """
+    df = pd.read_csv(csv_path, index_col=0)
+    np.save(npy_path, df.values.astype(np.float32))
+    np.save(station_ids_path(npy_path), df.index.values)
+    record_source(npy_path, csv_path)
+    print(f"Matrice convertie : {csv_path} -> {npy_path}")
+
+def load_distance_matrix(path):
+    """
+    Charge une matrice de distances et retourne (matrice, station_ids).
+      - Un .npy est mappé en mémoire (lecture seule, pas de copie).
+      - Un .csv est converti une seule fois en .npy à côté du CSV ; les chargements
+        suivants utilisent directement le .npy tant que le CSV n'a pas changé
+        (signature enregistrée dans <nom>_source.json).
+    Les appels répétés sur le même fichier retournent le même tableau.
+    """
+    path = os.path.abspath(path)
+    if path in _loaded:
+        return _loaded[path]
+
+    npy_path = path
+    if path.lower().endswith(".csv"):
+        npy_path = os.path.splitext(path)[0] + ".npy"
+        if not is_up_to_date(npy_path, path):
+            convert_csv_to_npy(path, npy_path)
+
+    matrix = np.load(npy_path, mmap_mode='r')
+    station_ids = np.load(station_ids_path(npy_path), allow_pickle=True)
+    _loaded[path] = (matrix, station_ids)
+    return _loaded[path]
+
+# ----------------- GRAPHE DES K PLUS PROCHES VOISINS -----------------
+def save_knn_graph(path, stations, neighbors, distances):
+    """
+    Sauvegarde le graphe k-NN (.npz) : identifiants, indices des voisins (N x k)
+    et distances en km (N x k).
+    """
+    np.savez(path, station_ids=np.asarray(stations), neighbors=neighbors, distances=distances)
+    print("Graphe des plus proches voisins sauvegardé :", path)
+
+def load_knn_graph(path):
+    """
+    Charge un graphe k-NN et retourne (station_ids, neighbors, distances).
+    """
+    with np.load(path, allow_pickle=True) as data:
+        return data['station_ids'], data['neighbors'], data['distances']
@@ -0,0 +1,235 @@
+import os
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+try:
+    from Data_cleanup.manifest import FileManifest
+    from Data_cleanup.flux_store import write_flux_store
+except ImportError:  # exécuté comme script depuis Data_cleanup/
+    from manifest import FileManifest
+    from flux_store import write_flux_store
+
+# ----------------- FLUX NETS PAR STATION -----------------
+# Flux net d'une station sur une période = arrivées - départs : par jour (format de
+# data/diff_dic.csv) ou par tranche horaire / de 15 minutes (flux_store).
+# Remplace la boucle ligne à ligne de data_cleanup_flux.ipynb : le format des dates est
+# détecté une fois par colonne, puis toute la colonne est convertie d'un coup.
+
+DATE_FORMATS = ["%Y-%m-%d %H:%M:%S", "%m/%d/%Y %H:%M", "%Y-%m-%d %H:%M", "%m/%d/%Y %H:%M:%S"]
+
+# === Colonnes possibles (schémas Divvy successifs) ===
+START_TIME_COLS = ['started_at', 'starttime', 'start_time']
+END_TIME_COLS = ['ended_at', 'stoptime', 'end_time']
+START_STATION_COLS = ['start_station_name', 'from_station_name']
+END_STATION_COLS = ['end_station_name', 'to_station_name']
+BIKE_TYPE_COLS = ['rideable_type']
+ALLOWED_BIKE_VALUES = ['electric_bike']
+
+def get_first_available(columns, candidates):
+    """
+    Première colonne de candidates présente dans columns (None sinon).
+    """
+    for col in candidates:
+        if col in columns:
+            return col
+    return None
+
+def detect_date_format(values, sample_size=100):
+    """
+    Premier format de DATE_FORMATS qui convertit tout un échantillon de valeurs non nulles
+    (None si aucun ne convient).
+    """
+    echantillon = values.dropna().astype(str).head(sample_size)
+    for fmt in DATE_FORMATS:
+        if not pd.to_datetime(echantillon, format=fmt, errors='coerce').isna().any():
+            return fmt
+    return None
+
+def parse_times(values):
+    """
+    Convertit une colonne de dates en horodatages. Le format détecté est appliqué à
+    toute la colonne ; les valeurs restantes (fichier aux formats mélangés) sont reprises
+    avec les autres formats, dans l'ordre de DATE_FORMATS. Valeur invalide : NaT.
+    """
+    values = values.astype(str)
+    fmt = detect_date_format(values)
+    formats = ([fmt] if fmt else []) + [f for f in DATE_FORMATS if f != fmt]
+    dates = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for f in formats:
+        manquantes = dates.isna()
+        if not manquantes.any():
+            break
+        dates[manquantes] = pd.to_datetime(values[manquantes], format=f, errors='coerce')
+    return dates
+
+def parse_days(values):
+    """
+    Comme parse_times, ramené au jour (minuit).
+    """
+    return parse_times(values).dt.normalize()
+
+def net_flow_counts(start_station, start_day, end_station, end_day):
+    """
+    Flux net indexé par (station_name, date) : nombre d'arrivées moins nombre de départs.
+    date est le début de la période du trajet (jour, ou tranche horaire en intra-journalier).
+    Les lignes sans station ou sans date sont ignorées.
+    """
+    departs = pd.DataFrame({'station_name': start_station, 'date': start_day}).dropna()
+    arrivees = pd.DataFrame({'station_name': end_station, 'date': end_day}).dropna()
+    departs = departs.groupby(['station_name', 'date'], observed=True).size()
+    arrivees = arrivees.groupby(['station_name', 'date'], observed=True).size()
+    return arrivees.sub(departs, fill_value=0).astype(np.int64)
+
+def file_net_flow(path, bike_types=ALLOWED_BIKE_VALUES, freq='D'):
+    """
+    Flux net (station_name, date) d'un CSV de trajets Divvy brut, par période freq
+    ('D' : jour, '1h', '15min', ...).
+    Seules les colonnes utiles sont lues. Si le fichier a une colonne de type de vélo,
+    seuls les trajets de bike_types sont comptés (None : tous les vélos).
+    Retourne (flux, nombre de lignes lues).
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    start_time = get_first_available(header, START_TIME_COLS)
+    end_time = get_first_available(header, END_TIME_COLS)
+    start_station = get_first_available(header, START_STATION_COLS)
+    end_station = get_first_available(header, END_STATION_COLS)
+    bike_type = get_first_available(header, BIKE_TYPE_COLS)
+    if start_time is None and end_time is None:
+        raise ValueError("pas de colonnes de date valides")
+
+    colonnes = [c for c in (start_time, end_time, start_station, end_station, bike_type) if c is not None]
+    df = pd.read_csv(path, usecols=colonnes, dtype=str)
+    lignes = len(df)
+
+    # Filtrer e-bikes si info dispo
+    if bike_type is not None and bike_types is not None:
+        df = df[df[bike_type].isin(bike_types)]
+
+    vide = pd.Series(index=df.index, dtype=object)
+    depart_ok = start_time is not None and start_station is not None
+    arrivee_ok = end_time is not None and end_station is not None
+    flux = net_flow_counts(
+        df[start_station].str.strip() if depart_ok else vide,
+        parse_times(df[start_time]).dt.floor(freq) if depart_ok else vide,
+        df[end_station].str.strip() if arrivee_ok else vide,
+        parse_times(df[end_time]).dt.floor(freq) if arrivee_ok else vide,
+    )
+    return flux, lignes
+
+def collect_net_flow(files, bike_types=ALLOWED_BIKE_VALUES, freq='D', manifest_folder=None):
+    """
+    Flux net de chaque fichier, par période freq. Un fichier en erreur est signalé et ignoré.
+    Avec manifest_folder, seuls les fichiers nouveaux ou modifiés sont relus ; le flux des
+    autres vient de leurs agrégats partiels enregistrés (voir manifest.FileManifest).
+    Retourne (partials, lignes lues, erreurs) : partials() produit le flux de chaque fichier
+    et peut être appelée plusieurs fois (relu depuis le disque avec un manifeste).
+    """
+    manifest = FileManifest(manifest_folder) if manifest_folder else None
+    if manifest is not None:
+        manifest.forget_missing(files)
+    a_lire = manifest.pending(files) if manifest is not None else files
+    total, lignes, errors = [], 0, []
+    for file in a_lire:
+        try:
+            flux, n = file_net_flow(file, bike_types, freq)
+            lignes += n
+            if manifest is not None:
+                manifest.record(file, flux)
+            else:
+                total.append(flux)
+        except Exception as e:
+            if manifest is not None:
+                manifest.discard(file)
+            errors.append(f"{file}: {str(e)}")
+    if manifest is not None:
+        manifest.save()
+        return (lambda: manifest.partials(files)), lignes, errors
+    return (lambda: iter(total)), lignes, errors
+
+def build_daily_net_flow(files, bike_types=ALLOWED_BIKE_VALUES, manifest_folder=None):
+    """
+    Flux net journalier cumulé de tous les fichiers (voir collect_net_flow).
+    Retourne (flux, lignes lues, erreurs).
+    """
+    partials, lignes, errors = collect_net_flow(files, bike_types, 'D', manifest_folder)
+    total = list(partials())
+    if not total:
+        return pd.Series(dtype=np.int64), lignes, errors
+    flux = pd.concat(total).groupby(level=['station_name', 'date']).sum()
+    return flux, lignes, errors
+
+def rebucket(flux, freq):
+    """
+    Regroupe un flux (station_name, date) sur des périodes plus longues (ex. 15min -> 1h).
+    """
+    dates = flux.index.get_level_values('date').floor(freq)
+    return flux.groupby([flux.index.get_level_values('station_name'), dates]).sum().rename_axis(
+        ['station_name', 'date'])
+
+def flow_pivot(flux):
+    """
+    Tableau station x date (colonnes 'AAAA-MM-JJ' triées), 0 si aucun mouvement.
+    """
+    pivot = flux.unstack('date', fill_value=0).sort_index()
+    pivot.columns = pd.to_datetime(pivot.columns).strftime('%Y-%m-%d')
+    return pivot[sorted(pivot.columns)].astype(np.int64)
+
+def to_station_ids(pivot):
+    """
+    Remplace les noms de stations par des identifiants 1..N dans l'ordre des noms.
+    Retourne (tableau indexé par station_id, mapping station_name -> station_id).
+    """
+    mapping = {name: i + 1 for i, name in enumerate(pivot.index)}
+    table = pivot.copy()
+    table.index = pd.Index(pivot.index.map(mapping), name='station_id')
+    return table, mapping
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flux nets journaliers par station (format diff_dic.csv).")
+    parser.add_argument("--input", default="/home/timeworid/Documents/TSI Project/data_output/divvydata",
+                        help="dossier des CSV de trajets")
+    parser.add_argument("--output", default="/home/timeworid/Documents/TSI Project/data_output/flux",
+                        help="dossier de sortie")
+    parser.add_argument("--all-bikes", action="store_true",
+                        help="compte tous les vélos (sinon uniquement ALLOWED_BIKE_VALUES si la colonne existe)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="ne relit que les CSV nouveaux ou modifiés (manifeste dans <output>/flux_manifest)")
+    parser.add_argument("--intraday", nargs="*", default=[], metavar="FREQ",
+                        help="périodes intra-journalières à stocker en plus (ex. 15min 1h) : flux_<FREQ>.npy")
+    args = parser.parse_args(argv)
+    bike_types = None if args.all_bikes else ALLOWED_BIKE_VALUES
+
+    csv_files = sorted(glob.glob(os.path.join(args.input, "*.csv")))
+    flux, loaded_rows, errors = build_daily_net_flow(
+        csv_files, bike_types, os.path.join(args.output, "flux_manifest") if args.incremental else None)
+
+    os.makedirs(args.output, exist_ok=True)
+    if not flux.empty:
+        table, mapping = to_station_ids(flow_pivot(flux))
+        table.to_csv(os.path.join(args.output, "diff_dic.csv"))
+        pd.DataFrame(list(mapping.items()), columns=["station_name", "station_id"]).to_csv(
+            os.path.join(args.output, "station_name_to_id.csv"), index=False)
+
+    # === Flux intra-journaliers : CSV lus une fois à la période la plus fine, puis regroupés ===
+    if args.intraday:
+        finest = min(args.intraday, key=pd.Timedelta)
+        partials, _, erreurs_intraday = collect_net_flow(
+            csv_files, bike_types, finest,
+            os.path.join(args.output, f"flux_manifest_{finest}") if args.incremental else None)
+        errors += [e for e in erreurs_intraday if e not in errors]
+        for freq in args.intraday:
+            write_flux_store(lambda: (p if freq == finest else rebucket(p, freq) for p in partials()),
+                             os.path.join(args.output, f"flux_{freq}.npy"), freq)
+
+    # === Infos log ===
+    print(f"CSV traités : {len(csv_files)}")
+    print(f"Lignes lues : {loaded_rows}")
+    print(f"Erreurs : {len(errors)}")
+    if errors:
+        print("Quelques erreurs rencontrées :")
+        for err in errors[:5]:
+            print(" -", err)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# ----------------- STOCKAGE BINAIRE DES FLUX INTRA-JOURNALIERS -----------------
+# Format : <nom>.npy (matrice stations x périodes, int16, mappée en mémoire)
+#          <nom>_stations.npy (noms des stations, ordre des lignes)
+#          <nom>_index.json (début de la première période, fréquence, nombre de périodes)
+# Les périodes sont régulières : la colonne d'une date se calcule sans lire la matrice,
+# et une fenêtre [début, fin] ne lit que les colonnes concernées.
+
+def stations_path(npy_path):
+    return os.path.splitext(npy_path)[0] + "_stations.npy"
+
+def index_path(npy_path):
+    return os.path.splitext(npy_path)[0] + "_index.json"
+
+def write_flux_store(partials, npy_path, freq):
+    """
+    Écrit les flux nets (station_name, date) déjà regroupés par période freq dans une
+    matrice int16 stations x périodes, sans construire de tableau complet en mémoire.
+      - partials : fonction sans argument produisant les flux partiels (un par fichier,
+        ex. flux.collect_net_flow) ; elle est appelée deux fois (plage de dates, puis écriture).
+    Les flux d'une même station et d'une même période venant de plusieurs fichiers s'additionnent.
+    Retourne le nombre de stations et de périodes (None si aucun flux).
+    """
+    stations, debut, fin = set(), None, None
+    for flux in partials():
+        if flux.empty:
+            continue
+        stations.update(flux.index.get_level_values('station_name').unique())
+        dates = flux.index.get_level_values('date')
+        debut = dates.min() if debut is None else min(debut, dates.min())
+        fin = dates.max() if fin is None else max(fin, dates.max())
+    if not stations:
+        return None
+
+    stations = pd.Index(sorted(stations))
+    index = pd.date_range(debut, fin, freq=freq)
+    matrix = np.lib.format.open_memmap(npy_path, mode='w+', dtype=np.int16,
+                                       shape=(len(stations), len(index)))
+    for flux in partials():
+        if flux.empty:
+            continue
+        lignes = stations.get_indexer(flux.index.get_level_values('station_name'))
+        colonnes = index.get_indexer(flux.index.get_level_values('date'))
+        # Un couple (station, période) est unique dans un flux partiel
+        cumul = matrix[lignes, colonnes].astype(np.int32) + flux.to_numpy()
+        matrix[lignes, colonnes] = np.clip(cumul, np.iinfo(np.int16).min, np.iinfo(np.int16).max)
+    matrix.flush()
+    del matrix
+    np.save(stations_path(npy_path), stations.to_numpy(dtype=str))
+    with open(index_path(npy_path), 'w') as f:
+        json.dump({'start': index[0].isoformat(), 'freq': freq, 'periods': len(index)}, f)
+    print(f"Flux {freq} sauvegardés : {npy_path} ({len(stations)} stations x {len(index)} périodes)")
+    return len(stations), len(index)
+
+class FluxStore:
+    """
+    Lecture d'un stock de flux (write_flux_store) : matrice mappée en lecture seule,
+    noms des stations (stations) et dates de début de chaque période (index).
+    """
+    def __init__(self, npy_path):
+        self.matrix = np.load(npy_path, mmap_mode='r')
+        self.stations = pd.Index(np.load(stations_path(npy_path)))
+        with open(index_path(npy_path)) as f:
+            meta = json.load(f)
+        self.freq = meta['freq']
+        self.index = pd.date_range(meta['start'], periods=meta['periods'], freq=self.freq)
+
+    def window(self, start=None, end=None, stations=None):
+        """
+        Flux des périodes commençant entre start et end (bornes incluses), pour les
+        stations demandées (toutes par défaut). Seule cette fenêtre est lue sur le disque.
+        Retourne un DataFrame stations x périodes.
+        """
+        colonnes = self.index.slice_indexer(start, end)
+        if stations is None:
+            lignes = slice(None)
+            noms = self.stations
+        else:
+            lignes = self.stations.get_indexer(stations)
+            if (lignes < 0).any():
+                raise KeyError(f"Stations absentes du stock : {list(np.asarray(stations)[lignes < 0])}")
+            noms = self.stations[lignes]
+        valeurs = np.asarray(self.matrix[lignes, colonnes])
+        return pd.DataFrame(valeurs, index=noms, columns=self.index[colonnes])
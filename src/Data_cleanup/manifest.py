@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+# ----------------- MANIFESTE DES FICHIERS SOURCES DÉJÀ TRAITÉS -----------------
+# Format : <dossier>/manifest.json : {chemin: {size, mtime_ns, hash, partial}}
+#          <dossier>/partials/<empreinte du chemin>.pkl : agrégats partiels du fichier
+# Seuls les fichiers nouveaux ou modifiés sont retraités ; les agrégats globaux sont
+# reconstruits en fusionnant les agrégats partiels de tous les fichiers présents.
+
+def file_hash(path, block_size=1 << 20):
+    """
+    Empreinte blake2b du contenu d'un fichier, lu par blocs.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for bloc in iter(lambda: f.read(block_size), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+class FileManifest:
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, "manifest.json")
+        self.partials_folder = os.path.join(folder, "partials")
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+
+    def key(self, path):
+        return os.path.abspath(path)
+
+    def is_current(self, path):
+        """
+        Vrai si le fichier a déjà été traité et n'a pas changé depuis.
+        Taille et date identiques : inchangé sans relire le fichier ; date différente
+        mais même contenu (fichier recopié, touch) : seule la date est mise à jour.
+        """
+        entry = self.entries.get(self.key(path))
+        if entry is None or not os.path.exists(entry['partial']):
+            return False
+        stat = os.stat(path)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        if file_hash(path) == entry['hash']:
+            entry['mtime_ns'] = stat.st_mtime_ns
+            return True
+        return False
+
+    def pending(self, files):
+        """
+        Fichiers nouveaux ou modifiés à (re)traiter.
+        """
+        return [file for file in files if not self.is_current(file)]
+
+    def record(self, path, partial):
+        """
+        Enregistre les agrégats partiels d'un fichier traité et sa signature.
+        """
+        os.makedirs(self.partials_folder, exist_ok=True)
+        key = self.key(path)
+        nom = hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + ".pkl"
+        partial_path = os.path.join(self.partials_folder, nom)
+        pd.to_pickle(partial, partial_path)
+        stat = os.stat(path)
+        self.entries[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                             'hash': file_hash(path), 'partial': partial_path}
+
+    def discard(self, path):
+        """
+        Oublie un fichier (ex. erreur de traitement) : il sera retraité au prochain passage.
+        """
+        entry = self.entries.pop(self.key(path), None)
+        if entry is not None and os.path.exists(entry['partial']):
+            os.remove(entry['partial'])
+
+    def forget_missing(self, files):
+        """
+        Retire du manifeste (et supprime les agrégats partiels) les fichiers qui ne
+        font plus partie des sources. Retourne la liste des fichiers retirés.
+        """
+        presents = {self.key(file) for file in files}
+        retires = [key for key in self.entries if key not in presents]
+        for key in retires:
+            entry = self.entries.pop(key)
+            if os.path.exists(entry['partial']):
+                os.remove(entry['partial'])
+        return retires
+
+    def partials(self, files):
+        """
+        Agrégats partiels enregistrés des fichiers donnés (dans leur ordre), pour fusion.
+        """
+        for file in files:
+            entry = self.entries.get(self.key(file))
+            if entry is not None:
+                yield pd.read_pickle(entry['partial'])
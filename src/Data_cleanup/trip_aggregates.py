@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+try:
+    from Data_cleanup.flux import ALLOWED_BIKE_VALUES, net_flow_counts, flow_pivot
+except ImportError:  # exécuté comme script depuis Data_cleanup/
+    from flux import ALLOWED_BIKE_VALUES, net_flow_counts, flow_pivot
+
+# ----------------- AGRÉGATS CUMULÉS DES TRAJETS -----------------
+# Les trajets sont lus par morceaux : chaque morceau est replié dans ces agrégats
+# puis libéré, sans jamais garder la table complète des trajets en mémoire.
+
+# Histogramme des durées : pas d'une minute sur [0, 120] (bornes de feature_engineering)
+DURATION_BINS = np.arange(0, 121, 1)
+
+def daily_net_flow(df):
+    """
+    Flux net par (station_name, date) d'un morceau déjà nettoyé (dates converties) :
+    arrivées du jour moins départs du jour, vélos électriques seulement si le type est connu.
+    """
+    if 'rideable_type' in df.columns:
+        df = df[df['rideable_type'].isin(ALLOWED_BIKE_VALUES)]
+    return net_flow_counts(df['start_station_name'], df['started_at'].dt.normalize(),
+                           df['end_station_name'], df['ended_at'].dt.normalize())
+
+class TripAggregates:
+    """
+    Agrégats cumulés par nom de station (nom en minuscules, comme après clean_data) :
+      - usage : nombre de départs + arrivées,
+      - lat_sum, lng_sum, coord_count : sommes des coordonnées (départs et arrivées)
+        et nombre de coordonnées valides, pour les coordonnées moyennes,
+    plus l'histogramme des durées de trajets, les catégories de durée, le flux net
+    journalier par station (daily_net_flow) et le nombre de trajets.
+    Deux agrégats partiels (par fichier, par processus) se combinent avec merge().
+    """
+    def __init__(self):
+        self.stations = pd.DataFrame(columns=['usage', 'lat_sum', 'lng_sum', 'coord_count'],
+                                     dtype=float)
+        self.duration_hist = np.zeros(len(DURATION_BINS) - 1, dtype=np.int64)
+        self.duration_categories = pd.Series(dtype=np.int64)
+        self.daily_flow = pd.Series(dtype=np.int64, index=pd.MultiIndex.from_arrays(
+            [pd.Index([], dtype=object), pd.DatetimeIndex([])], names=['station_name', 'date']))
+        self.n_trips = 0
+
+    def update(self, df):
+        """
+        Replie un morceau de trajets déjà nettoyé et enrichi (clean_data, feature_engineering).
+        """
+        if df.empty:
+            return self
+        extremites = pd.concat([
+            df[['start_station_name', 'start_lat', 'start_lng']].set_axis(['name', 'lat', 'lng'], axis=1),
+            df[['end_station_name', 'end_lat', 'end_lng']].set_axis(['name', 'lat', 'lng'], axis=1),
+        ], ignore_index=True)
+        valides = extremites[['lat', 'lng']].notna().all(axis=1)
+        groupes = extremites.groupby('name', sort=False)
+        partiel = pd.DataFrame({
+            'usage': groupes.size(),
+            'lat_sum': groupes['lat'].sum(),
+            'lng_sum': groupes['lng'].sum(),
+            'coord_count': valides.groupby(extremites['name'], sort=False).sum(),
+        }).astype(float)
+        self.stations = self.stations.add(partiel, fill_value=0)
+
+        self.duration_hist += np.histogram(df['trip_duration'], bins=DURATION_BINS)[0]
+        self.duration_categories = self.duration_categories.add(
+            df['trip_duration_category'].value_counts(), fill_value=0).astype(np.int64)
+        self.daily_flow = self.daily_flow.add(daily_net_flow(df), fill_value=0).astype(np.int64)
+        self.n_trips += len(df)
+        return self
+
+    def merge(self, other):
+        """
+        Ajoute les agrégats d'un autre TripAggregates (ex. un autre fichier).
+        """
+        self.stations = self.stations.add(other.stations, fill_value=0)
+        self.duration_hist += other.duration_hist
+        self.duration_categories = self.duration_categories.add(
+            other.duration_categories, fill_value=0).astype(np.int64)
+        self.daily_flow = self.daily_flow.add(other.daily_flow, fill_value=0).astype(np.int64)
+        self.n_trips += other.n_trips
+        return self
+
+    def station_mapping(self):
+        """
+        Identifiants globaux : noms triés numérotés à partir de 1, comme assign_station_ids
+        appliqué à l'ensemble des trajets (identique quel que soit l'ordre des fichiers).
+        """
+        return {name: i + 1 for i, name in enumerate(sorted(self.stations.index))}
+
+    def station_info(self):
+        """
+        Retourne {station_id: (mean_lat, mean_lng)}, comme update_station_info_from_trips.
+        """
+        mapping = self.station_mapping()
+        moyennes = self.stations[['lat_sum', 'lng_sum']].div(self.stations['coord_count'], axis=0)
+        return {mapping[name]: (row.lat_sum, row.lng_sum)
+                for name, row in moyennes.loc[list(mapping)].iterrows()}
+
+    def usage_by_station_id(self):
+        """
+        Usage (départs + arrivées) indexé par identifiant global de station.
+        """
+        mapping = self.station_mapping()
+        return self.stations['usage'].rename(index=mapping)
+
+    def flow_table(self):
+        """
+        Flux nets au format diff_dic.csv : une ligne par station avec les identifiants de
+        station_mapping() (ceux de la matrice de distances), une colonne par date 'AAAA-MM-JJ'.
+        Une station sans flux de vélos électriques a une ligne de zéros.
+        Retourne (table, mapping station_name -> station_id).
+        """
+        if self.daily_flow.empty:
+            return pd.DataFrame(), {}
+        mapping = self.station_mapping()
+        pivot = flow_pivot(self.daily_flow).reindex(list(mapping), fill_value=0)
+        pivot.index = pd.Index(pivot.index.map(mapping), name='station_id')
+        return pivot, mapping
@@ -0,0 +1,82 @@
+import os
+import numpy as np
+import pandas as pd
+
+# ----------------- CACHE PARQUET DES TRAJETS TRAITÉS -----------------
+# Format : <cache>/year=AAAA/month=M/*.parquet (une partition par mois de départ)
+# Les noms de stations et autres colonnes répétitives sont stockés en catégories,
+# les nombres dans les types les plus compacts suffisants.
+
+# Colonnes conservées dans le cache et leur type compact
+CACHE_DTYPES = {
+    'started_at': 'datetime64[ms]',
+    'ended_at': 'datetime64[ms]',
+    'rideable_type': 'category',
+    'member_casual': 'category',
+    'start_station_name': 'category',
+    'end_station_name': 'category',
+    'start_station_id': np.int32,
+    'end_station_id': np.int32,
+    'start_lat': np.float32,
+    'start_lng': np.float32,
+    'end_lat': np.float32,
+    'end_lng': np.float32,
+    'trip_duration': np.float32,
+    'day_of_week': np.int8,
+    'hour_of_day': np.int8,
+    'trip_distance': np.float32,
+    'trip_duration_category': 'category',
+}
+
+def compact_trips(df):
+    """
+    Réduit un DataFrame de trajets traités (process_trip_csv) aux colonnes du cache,
+    convertit chaque colonne dans son type compact et ajoute les colonnes de partition year/month.
+    """
+    colonnes = [col for col in CACHE_DTYPES if col in df.columns]
+    df = df[colonnes].astype({col: CACHE_DTYPES[col] for col in colonnes})
+    df['year'] = df['started_at'].dt.year.astype(np.int16)
+    df['month'] = df['started_at'].dt.month.astype(np.int8)
+    return df
+
+def write_trip_cache(df, cache_folder):
+    """
+    Écrit les trajets dans le cache, partitionné par année/mois.
+    Les mois présents dans df remplacent leur partition existante, les autres mois sont conservés.
+    """
+    df = compact_trips(df)
+    df.to_parquet(cache_folder, partition_cols=['year', 'month'], index=False,
+                  existing_data_behavior='delete_matching')
+    print(f"Cache Parquet mis à jour : {cache_folder} ({len(df)} trajets)")
+
+def cached_months(cache_folder):
+    """
+    Liste triée des mois présents dans le cache : [(année, mois), ...].
+    """
+    mois = []
+    if not os.path.isdir(cache_folder):
+        return mois
+    for annee in os.listdir(cache_folder):
+        if not annee.startswith('year='):
+            continue
+        for m in os.listdir(os.path.join(cache_folder, annee)):
+            if m.startswith('month='):
+                mois.append((int(annee[5:]), int(m[6:])))
+    return sorted(mois)
+
+def read_trip_cache(cache_folder, columns=None, months=None):
+    """
+    Lit le cache en ne chargeant que les colonnes demandées et les mois demandés.
+      - columns : liste de colonnes (None : toutes),
+      - months : liste de mois, (année, mois) ou 'AAAA-MM' (None : tous).
+    Seuls les fichiers des partitions sélectionnées sont ouverts.
+    """
+    filters = None
+    if months is not None:
+        filters = []
+        for m in months:
+            annee, mois = map(int, m.split('-')) if isinstance(m, str) else m
+            filters.append([('year', '=', annee), ('month', '=', mois)])
+        if not filters:
+            return pd.DataFrame(columns=columns)
+    return pd.read_parquet(cache_folder, columns=columns, filters=filters)
@@ -0,0 +1,172 @@
+# Décomposition "cluster d'abord, route ensuite" : les stations sont regroupées en zones
+# géographiques de charge équivalente, chaque zone est résolue indépendamment (OR-Tools ou AG),
+# puis les tournées sont rassemblées en un plan par camion.
+
+import io
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from OR_Strategies.OR_tool import TSPSolver
+from AlgoGenetics.main_AlgoGenetics import GeneticAlgorithm
+
+
+def bissection_ponderee(coords, poids, n_clusters):
+    """
+    Partitionne les stations par bissections récursives le long de l'axe le plus étendu.
+    Chaque coupe se fait à la médiane pondérée : les clusters ont la même somme de poids
+    (ici |flux prévu|), donc une charge de rééquilibrage comparable.
+    Retourne une liste de tableaux d'indices (un par cluster).
+    """
+    def couper(indices, k):
+        if k == 1 or len(indices) <= 1:
+            return [indices]
+        k1 = k // 2
+        lat, lng = coords[indices, 0], coords[indices, 1]
+        # Longitude corrigée par cos(latitude) pour comparer des étendues en distance
+        lng_km = lng * np.cos(np.radians(lat.mean()))
+        axe = lat if np.ptp(lat) >= np.ptp(lng_km) else lng_km
+        ordre = indices[np.argsort(axe, kind='stable')]
+        cumul = np.cumsum(poids[ordre])
+        coupe = int(np.searchsorted(cumul, cumul[-1] * k1 / k))
+        coupe = min(max(coupe, 1), len(ordre) - 1)
+        return couper(ordre[:coupe], k1) + couper(ordre[coupe:], k - k1)
+
+    return couper(np.arange(len(coords)), n_clusters)
+
+
+class ClusterRouting:
+    def __init__(self,
+                 station_info,
+                 flows,
+                 distance_matrix,
+                 n_clusters=4,
+                 backend='ortools',
+                 threshold=0,
+                 workers=1,
+                 time_limit=None,
+                 ga_params=None,
+                 station_ids=None):
+        """
+        - station_info : {station_id: (lat, lng)} (process_station_files / update_station_info_from_trips),
+        - flows : flux prévus par station (dict ou Series indexée par station_id),
+        - distance_matrix : DataFrame des distances indexé par station_id (GLOBAL_distance_all.csv),
+          ou matrice numpy accompagnée de station_ids (distance_store.load_distance_matrix),
+        - backend : 'ortools' (une tournée TSP par cluster) ou 'ga' (GeneticAlgorithm par cluster),
+        - threshold : seules les stations avec |flux| >= threshold sont routées.
+        """
+        if backend not in ('ortools', 'ga'):
+            raise ValueError(f"Backend inconnu : {backend} (attendu : 'ortools' ou 'ga')")
+        self.station_info = station_info
+        self.flows = pd.Series(flows, dtype=float)
+        if isinstance(distance_matrix, pd.DataFrame):
+            station_ids = distance_matrix.index if station_ids is None else station_ids
+            distance_matrix = distance_matrix.values
+        elif station_ids is None:
+            raise ValueError("station_ids est requis lorsque distance_matrix n'est pas un DataFrame")
+        # Ordre des lignes/colonnes de la matrice (la matrice mappée n'est pas copiée)
+        self.station_index = pd.Index(station_ids)
+        self.distance_matrix = distance_matrix
+        self.n_clusters = n_clusters
+        self.backend = backend
+        self.threshold = threshold
+        self.workers = workers
+        self.time_limit = time_limit
+        self.ga_params = ga_params or {}
+        self.clusters = []
+        self.non_resolus = []
+
+    # Stations routables : présentes dans la matrice, avec coordonnées et un flux suffisant
+    def stations_a_router(self):
+        ids = [sid for sid in sorted(self.station_info) if sid in self.station_index]
+        flux = self.flows.reindex(ids).fillna(0.0).values
+        garder = np.abs(flux) >= self.threshold
+        return np.asarray(ids)[garder], flux[garder]
+
+    def partitionner(self):
+        ids, flux = self.stations_a_router()
+        coords = np.array([self.station_info[sid] for sid in ids], dtype=float).reshape(-1, 2)
+        poids = np.abs(flux)
+        if poids.sum() == 0:
+            poids = np.ones_like(poids)
+        groupes = bissection_ponderee(coords, poids, min(self.n_clusters, max(len(ids), 1)))
+        self.clusters = [ids[g] for g in groupes if len(g)]
+        return self.clusters
+
+    # Sous-problème d'un cluster : le dépôt (noeud 0) est la station la plus proche du centre,
+    # les autres stations du cluster sont les noeuds 1..n (le flux du dépôt n'est pas routé)
+    def sous_probleme(self, stations):
+        coords = np.array([self.station_info[sid] for sid in stations], dtype=float)
+        depot = stations[int(np.argmin(((coords - coords.mean(axis=0)) ** 2).sum(axis=1)))]
+        autres = stations[stations != depot]
+        noeuds = np.concatenate([[depot], autres])
+        positions = self.station_index.get_indexer(noeuds)
+        distance = np.asarray(self.distance_matrix)[np.ix_(positions, positions)].astype(float)
+        flux = self.flows.reindex(autres).fillna(0.0).values
+        return {'noeuds': noeuds, 'distance': distance, 'flux': flux,
+                'backend': self.backend, 'time_limit': self.time_limit, 'ga_params': self.ga_params}
+
+    def solve(self):
+        clusters = self.partitionner()
+        problemes = [self.sous_probleme(stations) for stations in clusters]
+        if self.workers > 1 and len(problemes) > 1:
+            with ProcessPoolExecutor(self.workers) as executor:
+                resultats = list(executor.map(_resoudre_cluster, problemes))
+        else:
+            resultats = [_resoudre_cluster(p) for p in problemes]
+
+        # Assemblage : chaque tournée devient un camion du plan global
+        plan = []
+        self.non_resolus = [cluster_id for cluster_id, tournees in enumerate(resultats) if tournees is None]
+        for cluster_id in self.non_resolus:
+            print(f"Cluster {cluster_id} : aucune solution trouvée ({len(clusters[cluster_id])} stations non routées)")
+        for cluster_id, tournees in enumerate(resultats):
+            if tournees is None:
+                continue
+            for route, distance in tournees:
+                plan.append({'camion': len(plan), 'cluster': cluster_id,
+                             'route': route, 'distance': distance})
+        total_distance = sum(t['distance'] for t in plan)
+        for t in plan:
+            print(f"Camion {t['camion'] + 1} (cluster {t['cluster']}) : "
+                  f"{len(t['route'])} arrêts | Distance : {t['distance']:.3f} unités")
+        print(f"Distance totale (décomposition) : {total_distance:.3f} unités")
+        return plan, total_distance
+
+
+def _resoudre_cluster(probleme):
+    """
+    Résout un cluster et retourne une liste de tournées [(route en station_id, distance)],
+    ou None si le solveur ne trouve aucune solution.
+    Les identifiants sont rendus tels quels (entiers ou chaînes), convertis en types Python.
+    """
+    noeuds, distance = probleme['noeuds'], probleme['distance']
+    noeuds = [n.item() if isinstance(n, np.generic) else n for n in noeuds]
+    if len(noeuds) == 1:
+        return []
+    if len(noeuds) == 2:
+        return [([noeuds[0], noeuds[1], noeuds[0]], float(distance[0, 1] + distance[1, 0]))]
+
+    sortie = io.StringIO()
+    with contextlib.redirect_stdout(sortie):
+        if probleme['backend'] == 'ortools':
+            solver = TSPSolver(distance=distance)
+            solution = solver.solve(time_limit=probleme['time_limit'],
+                                    metaheuristic='GUIDED_LOCAL_SEARCH' if probleme['time_limit'] else None)
+            if solution is None:
+                return None
+            routes, _ = solution
+            return [([noeuds[n] for n in route], dist) for route, dist in routes.values()]
+
+        ga = GeneticAlgorithm(genome_length=len(noeuds) - 1, distance_matrix=distance,
+                              stations=probleme['flux'], **probleme['ga_params'])
+        best_genome, _, _ = ga.run(time_budget=probleme['time_limit'])
+        nb_camions, stations = ga.decoder_genome(best_genome)
+        # Tournées partant du dépôt et y revenant, comme celles d'OR-Tools (gène 0 : dépôt, ignoré)
+        tournees = []
+        for camion in ga.repartir_stations(nb_camions, stations):
+            arrets = [n for n in camion if n != 0]
+            if arrets:
+                trajet = [0] + arrets + [0]
+                tournees.append(([noeuds[n] for n in trajet], ga.distance_totale([trajet])))
+        return tournees
@@ -0,0 +1,226 @@
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+from functools import wraps
+from collections import Counter
+
+# ----------------- MESURES DU PIPELINE : CHRONOMÈTRES, COMPTEURS, PROFILAGE -----------------
+# Désactivé par défaut : chaque appel se limite alors à tester un booléen, les points de mesure
+# peuvent rester dans les boucles chaudes. enable() active la collecte pour le processus,
+# write_json() écrit les mesures de l'exécution.
+# Noms des mesures : "<module>.<mesure>" (ex. "ga.fitness_population", "or.solutions").
+
+class _State:
+    def __init__(self):
+        self.enabled = False
+        self.counters = Counter()
+        self.timers = {}  # nom -> [appels, total (s), max (s)]
+        self.items = Counter()  # éléments traités sous un chronomètre (débit = éléments / temps total)
+        self.started = None
+        self.profiler = None
+
+_state = _State()
+
+def enable():
+    _state.enabled = True
+    if _state.started is None:
+        _state.started = time.time()
+
+def disable():
+    _state.enabled = False
+
+def is_enabled():
+    return _state.enabled
+
+def reset():
+    _state.counters = Counter()
+    _state.timers = {}
+    _state.items = Counter()
+    _state.started = time.time() if _state.enabled else None
+
+def count(name, n=1):
+    if _state.enabled:
+        _state.counters[name] += n
+
+def items(name, n):
+    """
+    Compte n éléments traités sous le chronomètre name (ex. génomes évalués) : le rapport
+    en déduit le débit (items_per_s).
+    """
+    if _state.enabled:
+        _state.items[name] += n
+
+def record(name, seconds):
+    """
+    Ajoute une durée mesurée par l'appelant au chronomètre name.
+    """
+    if _state.enabled:
+        stats = _state.timers.get(name)
+        if stats is None:
+            _state.timers[name] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+@contextlib.contextmanager
+def timer(name):
+    """
+    Chronomètre un bloc : with metrics.timer("aggregate.process_trip_files"): ...
+    """
+    if not _state.enabled:
+        yield
+        return
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - debut)
+
+def timed(name):
+    """
+    Décorateur : chronomètre chaque appel de la fonction sous le nom name.
+    """
+    def decorateur(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            debut = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - debut)
+        return wrapper
+    return decorateur
+
+def snapshot():
+    """
+    Mesures collectées : {'counters': {nom: n}, 'timers': {nom: {calls, total_s, mean_s, max_s}}},
+    avec items et items_per_s pour les chronomètres dont les éléments sont comptés.
+    """
+    timers = {}
+    for name, (n, total, maximum) in _state.timers.items():
+        timers[name] = {'calls': n, 'total_s': total, 'mean_s': total / n, 'max_s': maximum}
+        if name in _state.items:
+            timers[name]['items'] = _state.items[name]
+            timers[name]['items_per_s'] = _state.items[name] / total if total > 0 else None
+    return {'counters': dict(_state.counters), 'timers': timers}
+
+def merge(mesures):
+    """
+    Ajoute des mesures venues d'un autre processus (snapshot() du processus fils).
+    """
+    if not _state.enabled:
+        return
+    _state.counters.update(mesures['counters'])
+    for name, t in mesures['timers'].items():
+        stats = _state.timers.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += t['calls']
+        stats[1] += t['total_s']
+        stats[2] = max(stats[2], t['max_s'])
+        if 'items' in t:
+            _state.items[name] += t['items']
+
+# ----------------- PROFILAGE -----------------
+class SamplingProfiler(threading.Thread):
+    """
+    Profileur par échantillonnage : toutes les intervalle secondes, relève la fonction en
+    cours (fichier:ligne fonction) du thread principal. Coût indépendant du nombre d'appels,
+    contrairement à cProfile.
+    """
+    def __init__(self, intervalle=0.005):
+        super().__init__(daemon=True)
+        self.intervalle = intervalle
+        self.cible = threading.main_thread().ident
+        self.arret = threading.Event()
+        self.echantillons = Counter()
+
+    def run(self):
+        while not self.arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self.cible)
+            if frame is not None:
+                code = frame.f_code
+                self.echantillons[f"{code.co_filename}:{frame.f_lineno} {code.co_name}"] += 1
+
+    def stop(self):
+        self.arret.set()
+        self.join()
+
+    def top(self, n=30):
+        total = sum(self.echantillons.values()) or 1
+        return [{'location': loc, 'samples': k, 'share': k / total} for loc, k in self.echantillons.most_common(n)]
+
+def start_profile(mode):
+    """
+    Démarre le profilage du processus : mode 'cprofile' ou 'sample' (None : aucun).
+    """
+    if mode is None:
+        return
+    if mode == 'cprofile':
+        _state.profiler = cProfile.Profile()
+        _state.profiler.enable()
+    elif mode == 'sample':
+        _state.profiler = SamplingProfiler()
+        _state.profiler.start()
+    else:
+        raise ValueError(f"Profilage inconnu : {mode} ('cprofile' ou 'sample')")
+
+def stop_profile(n=30, stats_path=None):
+    """
+    Arrête le profilage et retourne les n entrées les plus coûteuses (None si pas de profilage).
+    Avec cProfile, stats_path reçoit aussi les statistiques complètes (pstats / snakeviz).
+    """
+    profiler, _state.profiler = _state.profiler, None
+    if profiler is None:
+        return None
+    if isinstance(profiler, SamplingProfiler):
+        profiler.stop()
+        return {'mode': 'sample', 'top': profiler.top(n)}
+    profiler.disable()
+    if stats_path is not None:
+        profiler.dump_stats(stats_path)
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    top = []
+    for (fichier, ligne, fonction), (_, appels, propre, cumule, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:n]:
+        top.append({'location': f"{fichier}:{ligne} {fonction}", 'calls': appels,
+                    'self_s': propre, 'cumulative_s': cumule})
+    return {'mode': 'cprofile', 'top': top, 'stats_path': stats_path}
+
+def write_json(path, profile=None, extra=None):
+    """
+    Écrit les mesures de l'exécution (et le résumé du profilage) dans un fichier JSON.
+    """
+    rapport = {
+        'started': _state.started,
+        'wall_s': time.time() - _state.started if _state.started is not None else None,
+        'argv': sys.argv,
+        **snapshot(),
+        'profile': profile,
+        **(extra or {}),
+    }
+    with open(path, 'w') as f:
+        json.dump(rapport, f, indent=1, default=str)
+    print(f"Mesures sauvegardées : {path}")
+
+def start_run(profile=None):
+    """
+    Active les mesures (et le profilage, voir start_profile) pour l'exécution d'un script.
+    """
+    enable()
+    start_profile(profile)
+
+def finish_run(path, extra=None):
+    """
+    Arrête le profilage et écrit les mesures de l'exécution dans path
+    (avec cProfile, statistiques complètes dans <path sans extension>.prof).
+    """
+    stats_path = os.path.splitext(path)[0] + ".prof" if isinstance(_state.profiler, cProfile.Profile) else None
+    write_json(path, stop_profile(stats_path=stats_path), extra)
@@ -1,25 +1,58 @@
-import pandas as pd
+import numpy as np
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+from Data_cleanup import distance_store
+from Instrumentation import metrics
 
 class TSPSolver:
-    def __init__(self, csv_path):
+    metrics_name = "or.tsp"  # préfixe des mesures (Instrumentation.metrics)
+
+    def __init__(self, csv_path=None, distance_scale=1000, distance=None, neighbors=None):
         self.csv_path = csv_path
-        self.distance = self.load_distance()
+        # Graphe k-NN (indices des voisins de chaque noeud, ex. aggregate.build_knn_graph) :
+        # utilisé seulement avec solve(use_neighbors=True), voir restrict_arcs
+        self.neighbors = neighbors
+        # OR-Tools travaille en coûts entiers : les distances (km) sont multipliées par
+        # distance_scale puis arrondies (1000 -> précision au mètre) au lieu d'être tronquées
+        self.distance_scale = distance_scale
+        # Matrice fournie directement (ex. sous-matrice d'un cluster) ou lue depuis csv_path
+        self.distance = self.load_distance() if distance is None else distance
+        self.cost_matrix = self.build_cost_matrix()
 
+    # Matrice partagée en lecture seule (.npy mappé, CSV converti une seule fois)
     def load_distance(self):
-        df = pd.read_csv(self.csv_path, index_col=0)
-        return df.values.tolist()
+        distance, _ = distance_store.load_distance_matrix(self.csv_path)
+        return distance
+
+    # Matrice des coûts entiers, calculée une seule fois
+    def build_cost_matrix(self):
+        distance = np.asarray(self.distance, dtype=float)
+        return np.rint(distance * self.distance_scale).astype(np.int64)
 
     def create_data_model(self):
         return {
-            'distance': self.distance,
+            'distance': self.cost_matrix,
             'num_vehicles': 1,
             'depot': 0  # Station de départ (par défaut : première station)
         }
 
-    def solve(self):
+    # time_limit (secondes) et solution_limit bornent la recherche ; metaheuristic
+    # (ex. 'GUIDED_LOCAL_SEARCH') améliore la solution initiale tant qu'une limite n'est pas atteinte.
+    # use_neighbors : restreint les arcs au graphe k-NN (voir restrict_arcs), désactivé par défaut
+    def solve(self, time_limit=None, metaheuristic=None, solution_limit=None, use_neighbors=False):
+        if metaheuristic is not None and time_limit is None and solution_limit is None:
+            raise ValueError("Une métaheuristique nécessite time_limit ou solution_limit")
         data = self.create_data_model()
+        manager, routing, solution = self.solve_routing(
+            data, time_limit, metaheuristic, solution_limit, use_neighbors and self.neighbors is not None)
+
+        if solution:
+            self.print_solution(manager, routing, solution)
+            return self.return_solution(manager, routing, solution, data)
+        print("Aucune solution trouvée.")
 
+    # Construit et résout le modèle de routage de data ; retourne (manager, routing, solution),
+    # solution étant None si aucune n'est trouvée
+    def solve_routing(self, data, time_limit, metaheuristic, solution_limit, use_neighbors):
         # Création du gestionnaire d'index
         manager = pywrapcp.RoutingIndexManager(
             len(data['distance']), data['num_vehicles'], data['depot']
@@ -28,60 +61,204 @@ class TSPSolver:
         # Création du modèle de routage
         routing = pywrapcp.RoutingModel(manager)
 
-        # Fonction de coût
-        def distance_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            return data['distance'][from_node][to_node]
-
-        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        # Fonction de coût : matrice entière enregistrée côté C++ (pas de callback Python par arc)
+        with metrics.timer(f"{self.metrics_name}.register_matrix"):
+            transit_callback_index = routing.RegisterTransitMatrix(data['distance'].tolist())
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+        self.add_constraints(manager, routing, data)
+        if use_neighbors:
+            self.restrict_arcs(manager, routing, data)
 
         # Paramètres de recherche
-        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-        search_parameters.first_solution_strategy = (
-            routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
+        search_parameters = self.search_parameters(time_limit, metaheuristic, solution_limit,
+                                                   use_neighbors)
 
         # Résolution
-        solution = routing.SolveWithParameters(search_parameters)
+        solution = self.run_search(routing, search_parameters, self.metrics_name)
+        if not solution and use_neighbors:
+            # Graphe des voisins trop restrictif : nouvelle résolution sur le graphe complet
+            print("Aucune solution sur le graphe k-NN, résolution sur le graphe complet.")
+            metrics.count(f"{self.metrics_name}.knn_fallback")
+            return self.solve_routing(data, time_limit, metaheuristic, solution_limit, use_neighbors=False)
+        return manager, routing, solution
 
-        if solution:
-            self.print_solution(manager, routing, solution)
-            return self.return_solution(manager, routing, solution, data)
-        else:
-            print("Aucune solution trouvée.")
+    # Contraintes ajoutées au modèle après les coûts des arcs (aucune pour le TSP)
+    def add_constraints(self, manager, routing, data):
+        pass
 
-    def print_solution(self, manager, routing, solution):
-        index = routing.Start(0)
+    # Recherche instrumentée : durée et nombre de solutions trouvées pendant la recherche
+    # (callback OR-Tools enregistré seulement si les mesures sont actives)
+    def run_search(self, routing, search_parameters, name):
+        if metrics.is_enabled():
+            routing.AddAtSolutionCallback(lambda: metrics.count(f"{name}.solutions"))
+        with metrics.timer(f"{name}.search"):
+            return routing.SolveWithParameters(search_parameters)
+
+    # Voisins candidats de chaque noeud : graphe k-NN rendu symétrique.
+    # Pour un sous-problème (data['nodes'] : noeud local -> noeud de la matrice complète),
+    # la plupart des voisins globaux ne sont pas à visiter : on reprend alors les k plus
+    # proches parmi les noeuds du sous-problème, k étant celui du graphe fourni
+    def candidate_neighbors(self, nodes=None):
+        voisins = np.asarray(self.neighbors)
+        if nodes is not None:
+            k = min(voisins.shape[1], len(nodes) - 1)
+            if k <= 0:
+                return [set() for _ in nodes]
+            distance = self.cost_matrix[np.ix_(nodes, nodes)].astype(float)
+            np.fill_diagonal(distance, np.inf)
+            voisins = np.argpartition(distance, k - 1, axis=1)[:, :k]
+        candidats = [set(map(int, v)) for v in voisins]
+        for i, v in enumerate(voisins):
+            for j in v:
+                candidats[int(j)].add(i)
+        return candidats
+
+    # Limite le successeur de chaque noeud à ses voisins (ou au retour au dépôt).
+    # Le noeud lui-même reste autorisé : c'est ainsi qu'OR-Tools code une station abandonnée.
+    # Le dépôt a un index de départ par camion : chacun est limité aux voisins du dépôt
+    # ou à la fin de sa propre tournée (camion inutilisé).
+    # Mesuré sur des villes aléatoires (k = 5 à 20, 60 à 2000 noeuds) : tournées 2 à 9 %
+    # plus longues à temps égal, sans gain de temps net ; option à réserver aux très
+    # grands réseaux où l'enregistrement des arcs domine.
+    def restrict_arcs(self, manager, routing, data):
+        fins = [routing.End(v) for v in range(data['num_vehicles'])]
+        for node, voisins in enumerate(self.candidate_neighbors(data.get('nodes'))):
+            autorises = [manager.NodeToIndex(v) for v in voisins if v != data['depot']]
+            if node == data['depot']:
+                for v in range(data['num_vehicles']):
+                    routing.NextVar(routing.Start(v)).SetValues(autorises + [routing.End(v)])
+                continue
+            index = manager.NodeToIndex(node)
+            routing.NextVar(index).SetValues(autorises + fins + [index])
+
+    # PATH_CHEAPEST_ARC par défaut. Sur le graphe k-NN (use_neighbors), il peut s'enfermer
+    # dans une impasse et ne jamais trouver de première solution : l'insertion parallèle
+    # construit alors les tournées sans ce blocage
+    def search_parameters(self, time_limit=None, metaheuristic=None, solution_limit=None,
+                          use_neighbors=False):
+        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+        search_parameters.first_solution_strategy = (
+            routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION if use_neighbors
+            else routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
+        if metaheuristic is not None:
+            search_parameters.local_search_metaheuristic = getattr(
+                routing_enums_pb2.LocalSearchMetaheuristic, metaheuristic)
+        if time_limit is not None:
+            search_parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
+        if solution_limit is not None:
+            search_parameters.solution_limit = solution_limit
+        return search_parameters
+
+    # Noeuds visités par un véhicule (dépôt de départ et d'arrivée compris) et coût entier de sa tournée
+    def vehicle_route(self, manager, routing, solution, vehicle_id):
+        index = routing.Start(vehicle_id)
         route = []
-        total_distance = 0
-        print("Chemin optimal :")
+        route_cost = 0
         while not routing.IsEnd(index):
-            node = manager.IndexToNode(index)
-            route.append(node)
+            route.append(manager.IndexToNode(index))
             next_index = solution.Value(routing.NextVar(index))
-            total_distance += routing.GetArcCostForVehicle(index, next_index, 0)
+            route_cost += routing.GetArcCostForVehicle(index, next_index, vehicle_id)
             index = next_index
-        route.append(manager.IndexToNode(index))
+        route.append(manager.IndexToNode(index))  # retour au dépôt
+        return route, route_cost
+
+    def print_solution(self, manager, routing, solution):
+        route, total_distance = self.vehicle_route(manager, routing, solution, 0)
+        print("Chemin optimal :")
         print(" → ".join(map(str, route)))
-        print(f"Distance totale : {total_distance} unités")
-    
-    def return_solution(self,manager, routing, solution, data):
+        print(f"Distance totale : {total_distance / self.distance_scale} unités")
+
+    # Tournées en noeuds de la matrice complète (data['nodes'] pour un sous-problème) et distances en km
+    def return_solution(self, manager, routing, solution, data):
         total_distance = 0
         routes = {}
 
         for vehicle_id in range(data['num_vehicles']):
-            index = routing.Start(vehicle_id)
-            route = []
-            route_distance = 0
-            while not routing.IsEnd(index):
-                node = manager.IndexToNode(index)
-                route.append(node)
-                next_index = solution.Value(routing.NextVar(index))
-                route_distance += routing.GetArcCostForVehicle(index, next_index, vehicle_id)
-                index = next_index
-            route.append(manager.IndexToNode(index))  # retour au dépôt
+            route, route_distance = self.vehicle_route(manager, routing, solution, vehicle_id)
+            if 'nodes' in data:
+                route = [int(data['nodes'][node]) for node in route]
             total_distance += route_distance
-            routes[vehicle_id] = (route, route_distance)
+            routes[vehicle_id] = (route, route_distance / self.distance_scale)
+
+        return routes, total_distance / self.distance_scale
+
+
+class RebalancingVRPSolver(TSPSolver):
+    """
+    Rééquilibrage multi-camions avec capacité :
+      - demands : flux prévus signés par station (sortie de BikeFluctuationPredictor),
+        demands[k] correspond au noeud k + 1 de la matrice (même convention que
+        GeneticAlgorithm.calculate_flow), le noeud 0 étant le dépôt,
+      - un flux positif est un surplus à collecter, un flux négatif un manque à livrer,
+      - seules les stations dont |flux| > threshold sont visitées (0 : tout déséquilibre non nul),
+      - une station non servie coûte unserved_penalty (km) par vélo non déplacé.
+    """
+    metrics_name = "or.vrp"
+
+    def __init__(self, csv_path=None, demands=None, num_vehicles=2, vehicle_capacity=20, threshold=0,
+                 unserved_penalty=1000, depot=0, distance_scale=1000, distance=None, neighbors=None):
+        if demands is None:
+            raise ValueError("RebalancingVRPSolver nécessite les flux prévus (demands)")
+        super().__init__(csv_path, distance_scale, distance, neighbors)
+        self.demands = np.rint(np.asarray(demands, dtype=float)).astype(np.int64)
+        self.num_vehicles = num_vehicles
+        self.vehicle_capacity = vehicle_capacity
+        self.threshold = threshold
+        self.unserved_penalty = unserved_penalty
+        self.depot = depot
+        self.dropped = []
+
+    # Stations à servir (noeuds de la matrice) et leur demande, bornée par la capacité d'un camion
+    def stations_to_serve(self):
+        stations = np.flatnonzero(np.abs(self.demands) > self.threshold) + 1
+        stations = stations[(stations != self.depot) & (stations < len(self.cost_matrix))]
+        demandes = np.clip(self.demands[stations - 1], -self.vehicle_capacity, self.vehicle_capacity)
+        return stations, demandes
+
+    def create_data_model(self):
+        stations, demandes = self.stations_to_serve()
+        nodes = np.concatenate([[self.depot], stations])
+        print(f"Stations à rééquilibrer : {len(stations)} / {len(self.cost_matrix) - 1}")
+        return {
+            'nodes': nodes,  # noeud du sous-problème -> noeud de la matrice complète
+            'distance': self.cost_matrix[np.ix_(nodes, nodes)],
+            'demands': np.concatenate([[0], demandes]),
+            'num_vehicles': self.num_vehicles,
+            'vehicle_capacities': [self.vehicle_capacity] * self.num_vehicles,
+            'depot': 0
+        }
+
+    def add_constraints(self, manager, routing, data):
+        # Charge du camion : +demande en collecte, -demande en livraison, toujours dans [0, capacité].
+        # La charge au départ du dépôt est libre (le camion peut partir avec des vélos à livrer).
+        demand_callback_index = routing.RegisterUnaryTransitVector(data['demands'].tolist())
+        routing.AddDimensionWithVehicleCapacity(
+            demand_callback_index,
+            0,
+            data['vehicle_capacities'],
+            False,
+            'Capacity'
+        )
+
+        # Une station peut être abandonnée, moyennant une pénalité par vélo non déplacé
+        for node in range(1, len(data['nodes'])):
+            penalite = int(abs(data['demands'][node]) * self.unserved_penalty * self.distance_scale)
+            routing.AddDisjunction([manager.NodeToIndex(node)], penalite)
+
+    # Tournées affichées par return_solution (noeuds de la matrice complète, charge de chaque camion)
+    def print_solution(self, manager, routing, solution):
+        pass
+
+    def return_solution(self, manager, routing, solution, data):
+        routes, total_distance = super().return_solution(manager, routing, solution, data)
+        capacity = routing.GetDimensionOrDie('Capacity')
+        visites = set()
+        for vehicle_id, (route, _) in routes.items():
+            visites.update(route)
+            charge = solution.Value(capacity.CumulVar(routing.Start(vehicle_id)))
+            print(f"Camion {vehicle_id + 1} (charge au départ : {charge}) : {' → '.join(map(str, route))}")
 
+        self.dropped = [int(node) for node in data['nodes'][1:] if node not in visites]
+        if self.dropped:
+            print(f"Stations non servies : {self.dropped}")
         return routes, total_distance
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import hashlib
+import joblib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from Instrumentation import metrics
+
+# ----------------- EXÉCUTION DES ÉTAPES EN GRAPHE ET CACHE DES RÉSULTATS -----------------
+# Chaque étape a une clé : empreinte blake2b de son nom, de sa fonction, de ses paramètres,
+# de la signature de ses fichiers d'entrée et des clés des étapes dont elle dépend.
+# Format du cache : <dossier>/<étape>/<clé>.joblib
+# Une étape dont la clé est déjà dans le cache n'est pas recalculée ; ses dépendances ne
+# sont ni recalculées ni relues si aucune autre étape à calculer n'en a besoin.
+
+def input_signature(path):
+    """
+    Signature (chemin, taille, date) d'un fichier, ou de tous les fichiers d'un dossier
+    (parcouru récursivement). None si le chemin n'existe pas.
+    """
+    path = os.path.abspath(path)
+    if os.path.isdir(path):
+        fichiers = sorted(os.path.join(racine, f) for racine, _, noms in os.walk(path) for f in noms)
+    elif os.path.exists(path):
+        fichiers = [path]
+    else:
+        return None
+    signature = []
+    for fichier in fichiers:
+        stat = os.stat(fichier)
+        signature.append([fichier, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+class Stage:
+    """
+    Étape du pipeline : func est appelée avec le résultat de chaque dépendance (argument
+    nommé comme l'étape) et les paramètres params.
+      - files : fichiers ou dossiers lus par l'étape (leur signature entre dans la clé),
+      - cache : résultat enregistré dans le cache (False pour une étape rapide ou qui ne fait qu'afficher),
+      - process : exécutée dans un processus séparé, en parallèle des autres étapes prêtes
+        (func et son résultat doivent être picklables).
+    """
+    def __init__(self, name, func, deps=(), params=None, files=(), cache=True, process=False):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.params = params or {}
+        self.files = list(files)
+        self.cache = cache
+        self.process = process
+
+class ArtifactCache:
+    def __init__(self, folder):
+        self.folder = folder
+
+    def path(self, name, key):
+        return os.path.join(self.folder, name, key + ".joblib")
+
+    def has(self, name, key):
+        return os.path.exists(self.path(name, key))
+
+    def load(self, name, key):
+        return joblib.load(self.path(name, key))
+
+    def save(self, name, key, result):
+        path = self.path(name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture puis renommage : un résultat interrompu n'est jamais relu
+        joblib.dump(result, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+def _run_stage(func, kwargs, instrumente=False):
+    """
+    Exécute une étape ; dans un processus du pool (instrumente), les mesures de l'étape
+    sont collectées à part et renvoyées au processus principal avec le résultat.
+    """
+    if instrumente:
+        # Profilage éventuel hérité du processus principal : non collecté ici
+        metrics.stop_profile()
+        metrics.reset()
+        metrics.enable()
+    debut = time.perf_counter()
+    resultat = func(**kwargs)
+    return resultat, time.perf_counter() - debut, metrics.snapshot() if instrumente else None
+
+class Pipeline:
+    def __init__(self, cache_folder, workers=2):
+        self.cache = ArtifactCache(cache_folder)
+        self.workers = workers
+        self.stages = {}  # ordre d'ajout = ordre topologique (dépendances ajoutées avant)
+        self.report = []
+
+    def add(self, name, func, deps=(), params=None, files=(), cache=True, process=False):
+        if name in self.stages:
+            raise ValueError(f"Étape déjà définie : {name}")
+        manquantes = [d for d in deps if d not in self.stages]
+        if manquantes:
+            raise ValueError(f"Étape {name} : dépendances inconnues {manquantes} (à ajouter avant)")
+        self.stages[name] = Stage(name, func, deps, params, files, cache, process)
+        return self
+
+    def keys(self):
+        """
+        Clé de chaque étape, calculée sans rien exécuter.
+        """
+        keys = {}
+        for name, stage in self.stages.items():
+            contenu = {
+                'stage': name,
+                'func': f"{stage.func.__module__}.{stage.func.__qualname__}",
+                'params': stage.params,
+                'files': [input_signature(f) for f in stage.files],
+                'deps': {d: keys[d] for d in stage.deps},
+            }
+            texte = json.dumps(contenu, sort_keys=True, default=repr)
+            keys[name] = hashlib.blake2b(texte.encode(), digest_size=16).hexdigest()
+        return keys
+
+    def plan(self, keys, targets):
+        """
+        Étapes à relire depuis le cache et étapes à calculer pour obtenir targets.
+        """
+        a_relire, a_calculer = set(), set()
+        def besoin(name):
+            if name in a_relire or name in a_calculer:
+                return
+            stage = self.stages[name]
+            if stage.cache and self.cache.has(name, keys[name]):
+                a_relire.add(name)
+                return
+            a_calculer.add(name)
+            for dep in stage.deps:
+                besoin(dep)
+        for target in targets:
+            besoin(target)
+        return a_relire, a_calculer
+
+    def run(self, targets=None):
+        """
+        Exécute les étapes nécessaires à targets (toutes par défaut) et retourne
+        {étape: résultat}. report détaille chaque étape (statut, clé, durée).
+        """
+        keys = self.keys()
+        targets = list(self.stages) if targets is None else list(targets)
+        a_relire, a_calculer = self.plan(keys, targets)
+        results, self.report = {}, []
+
+        for name in [n for n in self.stages if n in a_relire]:
+            results[name] = self.cache.load(name, keys[name])
+            self.report.append({'stage': name, 'status': 'cache', 'key': keys[name], 'seconds': 0.0})
+            metrics.count("pipeline.cache_hits")
+            print(f"[pipeline] {name} : résultat en cache")
+
+        def terminer(name, result, secondes, mesures=None):
+            results[name] = result
+            metrics.record(f"pipeline.{name}", secondes)
+            if mesures is not None:
+                metrics.merge(mesures)
+            if self.stages[name].cache:
+                self.cache.save(name, keys[name], result)
+            self.report.append({'stage': name, 'status': 'calculé', 'key': keys[name], 'seconds': secondes})
+            print(f"[pipeline] {name} : calculé en {secondes:.2f} s")
+
+        restants = [n for n in self.stages if n in a_calculer]
+        pool = None
+        if any(self.stages[n].process for n in restants):
+            pool = ProcessPoolExecutor(max_workers=self.workers)
+        en_cours = {}
+        try:
+            while restants or en_cours:
+                prets = [n for n in restants if all(d in results for d in self.stages[n].deps)]
+                for name in prets:
+                    stage = self.stages[name]
+                    kwargs = {**{d: results[d] for d in stage.deps}, **stage.params}
+                    if stage.process:
+                        en_cours[pool.submit(_run_stage, stage.func, kwargs, metrics.is_enabled())] = name
+                        restants.remove(name)
+                locales = [n for n in prets if not self.stages[n].process]
+                if locales:
+                    # Étape du processus principal, pendant que les étapes soumises tournent
+                    name = locales[0]
+                    restants.remove(name)
+                    stage = self.stages[name]
+                    kwargs = {**{d: results[d] for d in stage.deps}, **stage.params}
+                    terminer(name, *_run_stage(stage.func, kwargs))
+                    continue
+                if not en_cours:
+                    raise RuntimeError(f"Étapes bloquées : {restants}")
+                termines, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+                for future in termines:
+                    name = en_cours.pop(future)
+                    try:
+                        terminer(name, *future.result())
+                    except Exception as e:
+                        raise RuntimeError(f"Étape {name} en échec : {e}") from e
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        return results
@@ -0,0 +1,111 @@
+import os
+from RandomForest import mainRandomForest
+from OR_Strategies import OR_tool
+from AlgoGenetics import main_AlgoGenetics
+from Data_cleanup import aggregate, distance_store
+
+# ----------------- ÉTAPES DU PIPELINE DE main.py -----------------
+# ingest → flux → prévision → matrice de distances → (AG ∥ OR-Tools TSP ∥ OR-Tools VRP) → comparaison
+# Les étapes exécutées dans un autre processus rechargent la matrice depuis son .npy
+# (mappé en mémoire) au lieu de recevoir une copie de la matrice.
+
+def ingest(trips_folder, output_folder):
+    """
+    Agrège les CSV de trajets (aggregate.py, mode incrémental) : matrices de distances,
+    graphe k-NN et flux journaliers dans output_folder.
+    """
+    aggregate.main(["--input", trips_folder, "--output", output_folder, "--incremental"])
+    return output_folder
+
+def flux_table(ingest=None, data_path=None):
+    """
+    Chemin du tableau des flux nets journaliers : diff_dic.csv écrit par ingest (mêmes
+    identifiants de stations que la matrice de distances), sinon data_path tel quel.
+    """
+    if ingest is None:
+        return data_path
+    return os.path.join(ingest, "diff_dic.csv")
+
+def distance(matrix_path, ingest=None):
+    """
+    Convertit si besoin la matrice CSV en .npy et retourne {'path', 'station_ids'} :
+    chaque étape consommatrice mappe le .npy elle-même.
+    """
+    _, station_ids = distance_store.load_distance_matrix(matrix_path)
+    npy_path = os.path.splitext(os.path.abspath(matrix_path))[0] + ".npy"
+    return {'path': npy_path, 'station_ids': station_ids}
+
+def prevision(flux_table, distance, lags=7, horizon=1, n_jobs=None, model_path=None):
+    """
+    Flux prévus du lendemain pour tout le réseau, dans l'ordre de la matrice.
+    Noeud 0 : dépôt ; flux_prevu[k] est le flux du noeud k + 1 (convention de l'AG et du VRP).
+    """
+    predictor = mainRandomForest.BikeFluctuationPredictor(
+        data_path=flux_table, lags=lags, horizon=horizon, n_jobs=n_jobs, model_path=model_path)
+    flux_reseau = predictor.run_forecast(distance['station_ids'])
+    return flux_reseau[1:, 0]
+
+def algorithme_genetique(distance, prevision, population_size=100, mutation_rate=0.1, generations=500,
+                         patience=50, seed=None):
+    distance_matrix, _ = distance_store.load_distance_matrix(distance['path'])
+    ag = main_AlgoGenetics.GeneticAlgorithm(
+        genome_length=len(prevision),
+        population_size=population_size,
+        mutation_rate=mutation_rate,
+        generations=generations,
+        distance_matrix=distance_matrix,
+        stations=prevision,
+        seed=seed
+    )
+    return ag.run(patience=patience)
+
+def tsp(distance, time_limit=None, metaheuristic=None):
+    distance_matrix, _ = distance_store.load_distance_matrix(distance['path'])
+    or_solver = OR_tool.TSPSolver(distance=distance_matrix)
+    return or_solver.solve(time_limit=time_limit, metaheuristic=metaheuristic)
+
+def vrp(distance, prevision, num_vehicles=2, vehicle_capacity=20, threshold=1, time_limit=30,
+        metaheuristic='GUIDED_LOCAL_SEARCH'):
+    distance_matrix, _ = distance_store.load_distance_matrix(distance['path'])
+    vrp_solver = OR_tool.RebalancingVRPSolver(
+        distance=distance_matrix,
+        demands=prevision,
+        num_vehicles=num_vehicles,
+        vehicle_capacity=vehicle_capacity,
+        threshold=threshold
+    )
+    solution_vrp, dist_vrp = vrp_solver.solve(time_limit=time_limit, metaheuristic=metaheuristic)
+    return solution_vrp, dist_vrp, vrp_solver.dropped
+
+def comparaison(algorithme_genetique, tsp, vrp):
+    best_genome, score_ag, arret_ag = algorithme_genetique
+    solution_or, dist_or = tsp
+    solution_vrp, dist_vrp, dropped = vrp
+
+    print("\n Comparaison des solutions :")
+    print("---------------------------------------------------")
+    print(f" Algorithme génétique :")
+    print(f"  → Génome : {best_genome}")
+    print(f"  → Fitness : {score_ag:.4f}")
+    print(f"  → Arrêt : {arret_ag}")
+
+    print("\n OR-Tools :")
+    for v_id, (route, dist) in solution_or.items():
+        print(f"  → Véhicule {v_id + 1} : {' → '.join(map(str, route))} | Distance : {dist} unités")
+    print(f"  → Distance totale OR-Tools : {dist_or} unités")
+    print(f"  → Fitness : {1/ (1 + dist_or)}")
+
+    print("\n OR-Tools VRP (rééquilibrage) :")
+    print(f"  → Camions : {len(solution_vrp)} | Stations non servies : {len(dropped)}")
+    print(f"  → Distance totale VRP : {dist_vrp} unités")
+    print("---------------------------------------------------")
+
+    # Comparatif simplifié
+    print("\n Résumé :")
+    print(f"Distance AG (estimée via fitness) : ~{round(1 / score_ag)} unités")
+    print(f"Distance OR-Tools : {dist_or} unités")
+    if (1 / score_ag) < dist_or:
+        print(" L'algorithme génétique propose une meilleure solution !")
+    else:
+        print(" OR-Tools propose une meilleure solution !")
+    return {'fitness_ag': score_ag, 'distance_or': dist_or, 'distance_vrp': dist_vrp}
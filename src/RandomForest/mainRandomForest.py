@@ -1,36 +1,204 @@
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
+import os
+import json
+import hashlib
+import joblib
 import pandas as pd
 import numpy as np
+from Instrumentation import metrics
+
+# ----------------- MODÈLE SAUVEGARDÉ -----------------
+# Format : <model_path> (forêt entraînée, joblib)
+#          <model_path>.json (empreintes des hyperparamètres et des données d'entraînement)
+# Mêmes hyperparamètres et mêmes données : le modèle est rechargé sans entraînement.
+# Mêmes hyperparamètres, données modifiées : la forêt est complétée (warm_start) par
+# trees_per_update arbres entraînés sur les nouvelles données, jusqu'à max_estimators.
+# Sinon : entraînement complet.
+
+def fingerprint_path(model_path):
+    return model_path + ".json"
+
+def data_fingerprint(X, y):
+    """
+    Empreinte blake2b des données d'entraînement (valeurs, colonnes et index).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(list(map(str, X.columns))).encode())
+    h.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(y, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+def lagged_windows(table, lags, horizon):
+    """
+    Fenêtres glissantes sur un tableau station x jour (colonnes dans l'ordre chronologique) :
+    pour chaque station et chaque jour t, X = les lags jours avant t, Y = les jours t .. t+horizon-1.
+    Les fenêtres sont rangées jour par jour : un nouveau jour ajoute des lignes à la fin.
+    Retourne (X, Y) de formes (n_fenêtres, lags) et (n_fenêtres, horizon).
+    """
+    valeurs = table.to_numpy(dtype=float)
+    if valeurs.shape[1] < lags + horizon:
+        raise ValueError(f"{valeurs.shape[1]} jours disponibles, {lags + horizon} nécessaires (lags + horizon)")
+    fenetres = np.lib.stride_tricks.sliding_window_view(valeurs, lags + horizon, axis=1)
+    fenetres = fenetres.transpose(1, 0, 2).reshape(-1, lags + horizon)
+    return fenetres[:, :lags], fenetres[:, lags:]
 
 class BikeFluctuationPredictor:
-    def __init__(self, data_path, target_column, test_size=0.2, n_estimators=100):
+    """
+    Deux modes :
+      - run() : évaluation, une colonne cible prédite à partir des autres jours, découpage
+        aléatoire des stations (y_pred ne couvre que les stations de test),
+      - run_forecast() : production, entraîné sur les fenêtres glissantes de lags jours de
+        toutes les stations, prédit les horizon jours suivant le dernier jour du fichier
+        pour tout le réseau en un seul appel.
+    """
+    def __init__(self, data_path, target_column=None, test_size=0.2, n_estimators=100,
+                 n_jobs=None, random_state=0, model_path=None, trees_per_update=20, max_estimators=300,
+                 lags=7, horizon=1):
         self.data_path = data_path
         self.target_column = target_column
         self.test_size = test_size
         self.n_estimators = n_estimators
-        self.model = RandomForestRegressor(n_estimators=self.n_estimators)
+        self.n_jobs = n_jobs  # cœurs utilisés pour l'entraînement et la prédiction (-1 : tous)
+        self.random_state = random_state  # découpage et forêt reproductibles (nécessaire pour réutiliser le modèle)
+        self.model_path = model_path
+        self.trees_per_update = trees_per_update
+        self.max_estimators = max_estimators
+        self.lags = lags
+        self.horizon = horizon
+        self.mode = None  # 'split' (load_data) ou 'forecast' (load_windows)
+        self.model = RandomForestRegressor(n_estimators=self.n_estimators, n_jobs=self.n_jobs,
+                                           random_state=self.random_state)
         self.data = None
         self.X_train = None
         self.X_test = None
         self.y_train = None
         self.y_test = None
         self.y_pred = None
+        self.forecast_dates = None
+        self.training = None  # 'chargé', 'complété' ou 'complet' après train()
 
+    @metrics.timed("rf.load_data")
     def load_data(self):
         self.data = pd.read_csv(self.data_path)
         X = self.data.drop(columns=[self.target_column])
         y = self.data[self.target_column]
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(X, y, test_size=self.test_size)
+        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
+            X, y, test_size=self.test_size, random_state=self.random_state)
+        self.mode = 'split'
+
+    def day_table(self):
+        """
+        Flux par station (index : station_id) et par jour, colonnes dans l'ordre chronologique.
+        """
+        return self.data[sorted(self.data.columns)]
+
+    @metrics.timed("rf.load_windows")
+    def load_windows(self):
+        """
+        Données d'entraînement du mode production : toutes les fenêtres glissantes de
+        diff_dic.csv (colonnes lag_<k> : flux k jours avant). Pas de jeu de test.
+        """
+        self.data = pd.read_csv(self.data_path, index_col=0)
+        X, Y = lagged_windows(self.day_table(), self.lags, self.horizon)
+        self.X_train = pd.DataFrame(X, columns=[f"lag_{k}" for k in range(self.lags, 0, -1)])
+        # Un horizon d'un jour reste une cible 1D (sinon avertissement de sklearn)
+        self.y_train = pd.Series(Y[:, 0]) if self.horizon == 1 else pd.DataFrame(Y)
+        self.X_test = self.y_test = None
+        self.mode = 'forecast'
 
+    def params_fingerprint(self):
+        """
+        Hyperparamètres et colonnes d'entrée : un modèle enregistré n'est réutilisable
+        (rechargé ou complété) que si tout est identique.
+        """
+        params = {'mode': self.mode, 'n_estimators': self.n_estimators, 'random_state': self.random_state,
+                  'features': list(map(str, self.X_train.columns))}
+        if self.mode == 'forecast':
+            params.update(lags=self.lags, horizon=self.horizon)
+        else:
+            params.update(test_size=self.test_size, target_column=self.target_column)
+        return params
+
+    def load_model(self):
+        """
+        Recharge le modèle enregistré et ses empreintes (None si absent).
+        """
+        if self.model_path is None or not os.path.exists(self.model_path) \
+                or not os.path.exists(fingerprint_path(self.model_path)):
+            return None
+        with open(fingerprint_path(self.model_path)) as f:
+            meta = json.load(f)
+        if meta['params'] != self.params_fingerprint():
+            return None
+        return joblib.load(self.model_path), meta
+
+    def save_model(self, data):
+        os.makedirs(os.path.dirname(os.path.abspath(self.model_path)), exist_ok=True)
+        joblib.dump(self.model, self.model_path)
+        with open(fingerprint_path(self.model_path), 'w') as f:
+            json.dump({'params': self.params_fingerprint(), 'data': data,
+                       'trees': len(self.model.estimators_)}, f, indent=1)
+
+    @metrics.timed("rf.train")
     def train(self):
+        metrics.items("rf.train", len(self.X_train))
+        data = data_fingerprint(self.X_train, self.y_train)
+        saved = self.load_model()
+        if saved is not None:
+            model, meta = saved
+            model.set_params(n_jobs=self.n_jobs)
+            if meta['data'] == data:
+                self.model, self.training = model, 'chargé'
+                metrics.count("rf.model_loaded")
+                print(f"Modèle rechargé : {self.model_path} ({len(model.estimators_)} arbres)")
+                return
+            if len(model.estimators_) + self.trees_per_update <= self.max_estimators:
+                # Nouveaux arbres entraînés sur les données à jour, anciens arbres conservés
+                model.set_params(warm_start=True, n_estimators=len(model.estimators_) + self.trees_per_update)
+                model.fit(self.X_train, self.y_train)
+                model.set_params(warm_start=False)
+                self.model, self.training = model, 'complété'
+                metrics.count("rf.model_grown")
+                print(f"Modèle complété : +{self.trees_per_update} arbres ({len(model.estimators_)} au total)")
+                self.save_model(data)
+                return
         self.model.fit(self.X_train, self.y_train)
+        self.training = 'complet'
+        metrics.count("rf.model_trained")
+        if self.model_path is not None:
+            self.save_model(data)
 
+    @metrics.timed("rf.predict")
     def predict(self):
         self.y_pred = self.model.predict(self.X_test)
         return self.y_pred
 
+    @metrics.timed("rf.forecast")
+    def forecast(self, station_ids=None):
+        """
+        Flux prévus des horizon jours suivant le dernier jour du fichier, pour toutes les
+        stations en un seul appel au modèle (mode production, après load_windows et train).
+        Avec station_ids (ex. distance_store.load_distance_matrix), le tableau suit cet ordre
+        et une station sans historique de flux a un flux prévu nul.
+        Retourne un tableau (n_stations, horizon) ; y_pred garde les prévisions indexées par station_id.
+        """
+        table = self.day_table()
+        derniers = pd.DataFrame(table.to_numpy(dtype=float)[:, -self.lags:], columns=self.X_train.columns)
+        prevus = self.model.predict(derniers).reshape(len(table), self.horizon)
+        metrics.items("rf.forecast", len(table))
+        self.forecast_dates = pd.date_range(pd.Timestamp(table.columns[-1]) + pd.Timedelta(days=1),
+                                            periods=self.horizon, freq='D').strftime('%Y-%m-%d')
+        self.y_pred = pd.DataFrame(prevus, index=table.index, columns=self.forecast_dates)
+        if station_ids is None:
+            return prevus
+        # Identifiants comparés en texte : int dans diff_dic.csv, int ou str dans la matrice
+        positions = table.index.astype(str).get_indexer(pd.Index(station_ids).astype(str))
+        alignes = np.zeros((len(positions), self.horizon))
+        alignes[positions >= 0] = prevus[positions[positions >= 0]]
+        return alignes
+
     def evaluate(self):
         self.predict()
         mae = mean_absolute_error(self.y_test, self.y_pred)
@@ -47,3 +215,13 @@ class BikeFluctuationPredictor:
         print("Évaluation du modèle...")
         self.evaluate()
         print(f"Y Prédit : {predictions}")
+
+    def run_forecast(self, station_ids=None):
+        print("Chargement des fenêtres de flux...")
+        self.load_windows()
+        print(f"Entraînement du modèle ({len(self.X_train)} fenêtres de {self.lags} jours)...")
+        self.train()
+        print("Prévisions pour tout le réseau...")
+        prevus = self.forecast(station_ids)
+        print(f"Flux prévus ({', '.join(self.forecast_dates)}) : {len(prevus)} stations")
+        return prevus
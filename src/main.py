@@ -1,60 +1,73 @@
-from RandomForest import mainRandomForest
-from OR_Strategies import OR_tool
-from AlgoGenetics import main_AlgoGenetics
-import pandas as pd
-import numpy as np
-
-def main():
-    # === 1. Prédire les flux de vélos du jour suivant ===
-    predictor = mainRandomForest.BikeFluctuationPredictor(
-        data_path="../data/diff_dic.csv",
-        target_column="2020-04-30"  # à remplacer dynamiquement si besoin
-    )
-    predictor.run()
-    flux_prevu = predictor.y_pred  # Liste de prédictions
-
-    # === 2. Charger la matrice de distances ===
-
-    dist_df = pd.read_csv("../data/GLOBAL_distance_all.csv", index_col=0)
-    distance_matrix = dist_df.values.tolist()
-
-    # === 3. Algorithme Génétique ===
-    ag = main_AlgoGenetics.GeneticAlgorithm(
-        genome_length=len(flux_prevu),
-        population_size=100,
-        mutation_rate=0.1,
-        generations=500,
-        distance_matrix=distance_matrix,
-        stations=flux_prevu
-    )
-    best_genome, score_ag = ag.run()
-
-    # === 4. Solution avec OR-Tools ===
-    or_solver = OR_tool.TSPSolver("../data/GLOBAL_distance_all.csv")
-    solution_or, dist_or = or_solver.solve()
-
-    # === 5. Présentation & comparaison ===
-    print("\n Comparaison des solutions :")
-    print("---------------------------------------------------")
-    print(f" Algorithme génétique :")
-    print(f"  → Génome : {best_genome}")
-    print(f"  → Fitness : {score_ag:.4f}")
-
-    print("\n OR-Tools :")
-    for v_id, (route, dist) in solution_or.items():
-        print(f"  → Véhicule {v_id + 1} : {' → '.join(map(str, route))} | Distance : {dist} unités")
-    print(f"  → Distance totale OR-Tools : {dist_or} unités")
-    print(f"  → Fitness : {1/ (1 + dist_or)}")
-    print("---------------------------------------------------")
-
-    # Comparatif simplifié
-    print("\n Résumé :")
-    print(f"Distance AG (estimée via fitness) : ~{round(1 / score_ag)} unités")
-    print(f"Distance OR-Tools : {dist_or} unités")
-    if (1 / score_ag) < dist_or:
-        print(" L'algorithme génétique propose une meilleure solution !")
+import os
+import argparse
+from Pipeline import dag, stages
+from Instrumentation import metrics
+
+# Dossier des CSV de trajets Divvy : None pour partir directement des fichiers de DATA_FOLDER
+TRIPS_FOLDER = None
+DATA_FOLDER = "../data"
+
+def build_pipeline():
+    # Chaque étape est mise en cache sous l'empreinte de ses entrées et paramètres :
+    # seules les étapes dont une entrée a changé sont recalculées
+    pipeline = dag.Pipeline(cache_folder=os.path.join(DATA_FOLDER, "pipeline_cache"), workers=3)
+
+    # === 1. Données : trajets agrégés et flux nets journaliers ===
+    if TRIPS_FOLDER is not None:
+        pipeline.add("ingest", stages.ingest, files=[TRIPS_FOLDER],
+                     params={'trips_folder': TRIPS_FOLDER, 'output_folder': DATA_FOLDER})
+        # diff_dic.csv écrit une seule fois, par ingest, numéroté comme la matrice de distances
+        pipeline.add("flux_table", stages.flux_table, deps=["ingest"], cache=False)
+        pipeline.add("distance", stages.distance, deps=["ingest"], cache=False,
+                     params={'matrix_path': os.path.join(DATA_FOLDER, "GLOBAL_distance_all.csv")})
     else:
-        print(" OR-Tools propose une meilleure solution !")
+        diff_dic = os.path.join(DATA_FOLDER, "diff_dic.csv")
+        matrix = os.path.join(DATA_FOLDER, "GLOBAL_distance_all.csv")
+        pipeline.add("flux_table", stages.flux_table, files=[diff_dic], cache=False,
+                     params={'data_path': diff_dic})
+        # Matrice binaire mappée en mémoire, partagée (lecture seule) par l'AG et OR-Tools
+        pipeline.add("distance", stages.distance, files=[matrix], cache=False,
+                     params={'matrix_path': matrix})
+
+    # === 2. Prévoir les flux de vélos du jour suivant pour tout le réseau ===
+    pipeline.add("prevision", stages.prevision, deps=["flux_table", "distance"],
+                 params={'lags': 7, 'horizon': 1, 'n_jobs': -1,
+                         'model_path': os.path.join(DATA_FOLDER, "models", "random_forest.joblib")})
+
+    # === 3. Algorithme Génétique et OR-Tools, en parallèle ===
+    pipeline.add("algorithme_genetique", stages.algorithme_genetique, deps=["distance", "prevision"],
+                 process=True,
+                 params={'population_size': 100, 'mutation_rate': 0.1, 'generations': 500, 'patience': 50})
+    pipeline.add("tsp", stages.tsp, deps=["distance"], process=True)
+    # Rééquilibrage multi-camions (nombre de camions fixé pour ne pas attendre l'AG)
+    pipeline.add("vrp", stages.vrp, deps=["distance", "prevision"], process=True,
+                 params={'num_vehicles': 2, 'vehicle_capacity': 20, 'threshold': 1,
+                         'time_limit': 30, 'metaheuristic': 'GUIDED_LOCAL_SEARCH'})
+
+    # === 4. Présentation & comparaison ===
+    pipeline.add("comparaison", stages.comparaison, deps=["algorithme_genetique", "tsp", "vrp"], cache=False)
+    return pipeline
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prévision des flux et rééquilibrage (AG et OR-Tools).")
+    parser.add_argument("--metrics", default=None,
+                        help="fichier JSON des mesures de l'exécution (durées, compteurs par étape)")
+    parser.add_argument("--profile", choices=["cprofile", "sample"], default=None,
+                        help="profilage du processus principal, résumé dans le fichier --metrics")
+    args = parser.parse_args(argv)
+    if args.metrics or args.profile:
+        metrics.start_run(args.profile)
 
+    pipeline = build_pipeline()
+    try:
+        pipeline.run()
+    finally:
+        if metrics.is_enabled():
+            metrics.finish_run(args.metrics or os.path.join(DATA_FOLDER, "run_metrics.json"),
+                               extra={'stages': pipeline.report})
+    print("\n Étapes :")
+    for etape in pipeline.report:
+        print(f"  → {etape['stage']} : {etape['status']} ({etape['seconds']:.2f} s)")
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules se lancent depuis src/ (imports "from AlgoGenetics... import ...")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from AlgoGenetics.main_AlgoGenetics import GeneticAlgorithm
+
+
+def algorithme(population_size, generations=5):
+    rng = np.random.default_rng(0)
+    return GeneticAlgorithm(genome_length=6, population_size=population_size, generations=generations,
+                            distance_matrix=rng.random((7, 7)), stations=rng.integers(-5, 5, 6), seed=1)
+
+
+@pytest.mark.parametrize("population_size", [3, 4, 5])
+def test_petites_populations(population_size):
+    meilleur, score, _ = algorithme(population_size).run()[:3]
+    assert len(meilleur) == 7
+    assert np.isfinite(score)
+
+
+@pytest.mark.parametrize("population_size", [3, 4, 7, 50])
+def test_tournoi_trois_candidats_distincts(population_size):
+    ga = algorithme(population_size)
+    ga.population = np.zeros((population_size, 7), dtype=np.int64)
+    ga.scores = np.arange(population_size, dtype=float)
+    gagnants = ga.selection_index(20000)
+    # Avec trois candidats distincts, les deux plus mauvais ne gagnent jamais
+    assert gagnants.min() >= 2
+    # Le meilleur gagne chaque tournoi où il est tiré : probabilité 3 / p
+    assert np.mean(gagnants == population_size - 1) == pytest.approx(3 / population_size, abs=0.02)